@@ -3,10 +3,13 @@ import json
 import os
 from pathlib import Path
 from typing import Optional
-import folium
-from streamlit_folium import st_folium
 import generator
-from shapely.geometry import shape, mapping, Point, LineString, Polygon
+import geojson_io
+import profiling
+from shapely.geometry import shape
+
+# folium / streamlit_folium are imported by the preview on first use: they are slow to
+# load and not needed until there is something to draw
 
 # Simple Streamlit UI to generate rows using [`generator.py:1`](generator.py:1)
 st.set_page_config(page_title="Rows GeoJSON Generator", layout="wide")
@@ -16,37 +19,128 @@ if "output_fc" not in st.session_state:
     st.session_state["output_fc"] = None
 if "last_error" not in st.session_state:
     st.session_state["last_error"] = None
+if "geometry_key" not in st.session_state:
+    st.session_state["geometry_key"] = None
+    st.session_state["output_params"] = None
 
 EXAMPLE_PATH = Path("Example/combined.geojson")
 EXAMPLE_TURN = Path("Example/turn.geojson")
 
 
+# Every widget interaction reruns this script; parsing and generation are cached by
+# content (bounded, and shared between sessions on the same server) so reruns that
+# don't change the inputs don't repeat any work.
+@st.cache_data(max_entries=64, show_spinner=False)
+def parse_geojson(text: str) -> dict:
+    return geojson_io.loads(text)
 
 
+@st.cache_data(max_entries=8, show_spinner=False)
+def load_example(path: str, mtime: float) -> Optional[dict]:
+    """Read an example file once per modification time."""
+    try:
+        return geojson_io.loads(Path(path).read_text())
+    except Exception:
+        return None
 
 
-
-
-def find_area_and_ab(fc: dict):
-    """Return (area_feature, ab_feature) or (None, None)"""
-    if not fc or "features" not in fc:
+@st.cache_data(max_entries=8, show_spinner=False)
+def load_example_fields(path: str, mtime: float):
+    """(area, AB) features of an example file, streamed only as far as needed."""
+    try:
+        return geojson_io.read_area_and_ab(path)
+    except Exception:
         return None, None
-    area = None
-    ab = None
-    for feat in fc["features"]:
-        geom_type = feat.get("geometry", {}).get("type", "")
-        if geom_type == "Polygon" and area is None:
-            area = feat
-        if geom_type == "LineString" and ab is None:
-            ab = feat
-    return area, ab
 
 
+def pick_feature(parsed: dict, geom_type: str) -> Optional[dict]:
+    """A Feature passes through; a FeatureCollection yields its first `geom_type` feature; a bare geometry is wrapped."""
+    if not isinstance(parsed, dict):
+        return None
+    if parsed.get("type") == "Feature":
+        return parsed
+    if parsed.get("type") == "FeatureCollection":
+        for f in parsed.get("features", []):
+            if (f.get("geometry") or {}).get("type") == geom_type:
+                return f
+        return None
+    if parsed.get("type") == geom_type:
+        return {"type": "Feature", "geometry": parsed, "properties": {}}
+    return None
+
+
+@st.cache_resource(max_entries=16, show_spinner=False)
+def cached_geometry(geometry_key: str, _area: dict, _ab: dict, spacing_m: float):
+    """Geometry stage keyed by `generator.geometry_key`; the FieldGeometry is shared, never mutated by callers."""
+    return generator.prepare_geometry(_area, _ab, spacing_m=spacing_m)
+
+
+@st.cache_data(max_entries=32, show_spinner=False)
+def cached_rows(generation_key: str, geometry_key: str, _geometry, _params: dict):
+    """
+    Downstream stages keyed by `generator.generation_key` (covers every generation input).
+    Returns the FeatureCollection and its `generator.FeatureRoles` side-table.
+    """
+    rowset = generator.build_rows(_geometry, **_params)
+    return rowset.to_geojson(), rowset.feature_roles()
+
 def add_geojson_to_map(m, fc, layer_name="layer", style=None):
+    import folium
     folium.GeoJson(fc, name=layer_name, style_function=lambda x: style or {}).add_to(m)
 
 
-def render_preview_map(area_feat, ab_feat, output_fc):
+# Characters of serialized output shown per page in the raw view
+RAW_PAGE_CHARS = 50_000
+
+# Export choices and the feature roles they select
+EXPORT_ROLES = {
+    "Rows": (generator.ROLE_ROW,),
+    "Turns": (generator.ROLE_TURN_A, generator.ROLE_TURN_B),
+    "Destinations": (generator.ROLE_DESTINATION,),
+}
+
+
+@st.cache_data(max_entries=8, show_spinner=False)
+def export_text(output_key: str, precision: int, compact: bool, include: tuple,
+                _output_fc: dict, _roles) -> str:
+    """Serialized export of the result identified by `output_key`, limited to the `include` roles."""
+    features = _output_fc.get("features", [])
+    if set(include) != set(EXPORT_ROLES):
+        roles = [role for name in include for role in EXPORT_ROLES[name]]
+        features = [features[i] for i in _roles.select(*roles)]
+    filtered_fc = {"type": "FeatureCollection", "features": features}
+    # shared serializer: rounds coordinates and uses orjson when available
+    return geojson_io.dumps(filtered_fc, precision=precision, compact=compact)
+
+
+# Preview limits: beyond these the layers are downsampled (every n-th feature) so large
+# fields stay interactive in the browser
+PREVIEW_MAX_PATHS = 1500
+PREVIEW_MAX_DESTINATIONS = 1500
+# ~10 cm is plenty on screen and keeps the embedded GeoJSON small
+PREVIEW_PRECISION = 6
+# Leaflet polyline simplification in pixels, applied per zoom level
+PREVIEW_SMOOTH_FACTOR = 1.5
+
+
+def _preview_layer(features, cap: int):
+    """Downsample `features` by stride to at most `cap`, rounded and stripped to the name property."""
+    stride = max(1, -(-len(features) // cap)) if cap > 0 else 1
+    sampled = features[::stride]
+    layer = [
+        {"type": "Feature",
+         "geometry": geojson_io.quantize_geometry(f.get("geometry"), PREVIEW_PRECISION),
+         "properties": {"name": (f.get("properties") or {}).get("name", "")}}
+        for f in sampled
+    ]
+    return {"type": "FeatureCollection", "features": layer}, stride
+
+
+def render_preview_map(area_feat, ab_feat, output_fc, output_roles=None, max_paths: int = PREVIEW_MAX_PATHS,
+                       max_destinations: int = PREVIEW_MAX_DESTINATIONS):
+    """Return (map, downsample messages)."""
+    import folium
+
     # determine center
     center = [0, 0]
     try:
@@ -62,6 +156,7 @@ def render_preview_map(area_feat, ab_feat, output_fc):
         center = [0, 0]
 
     m = folium.Map(location=center, zoom_start=17, tiles="OpenStreetMap")
+    notes = []
 
     if area_feat:
         add_geojson_to_map(m, {"type": "FeatureCollection", "features": [area_feat]}, "Area",
@@ -71,48 +166,40 @@ def render_preview_map(area_feat, ab_feat, output_fc):
                            style={"color": "#000000", "weight": 3})
 
     if output_fc:
-        # separate layers for rows and destinations
-        rows = []
-        dests = []
-        turns = []
-        for feat in output_fc.get("features", []):
-            ptype = feat.get("properties", {}).get("type", "")
-            geom_type = feat.get("geometry", {}).get("type", "")
-            # NetworkPath can be either a row or a turn - distinguish by geometry type
-            if ptype == "NetworkPath":
-                if geom_type == "LineString":
-                    # Check if it's a simple 2-point line (likely a row) or complex (likely a turn)
-                    coords = feat.get("geometry", {}).get("coordinates", [])
-                    if len(coords) <= 3:
-                        rows.append(feat)
-                    else:
-                        turns.append(feat)
-                else:
-                    turns.append(feat)
-            elif ptype == "NetworkDestination":
-                dests.append(feat)
-            elif ptype == "RowPath":  # Legacy support
-                rows.append(feat)
-            elif ptype == "DestinationPoint":  # Legacy support
-                dests.append(feat)
-            else:
-                # TurnAttachment or other
-                turns.append(feat)
-        if rows:
-            add_geojson_to_map(m, {"type": "FeatureCollection", "features": rows}, "Rows",
-                               style={"color": "#ff7f00", "weight": 2})
+        # separate layers for rows, turns and destinations, split by the role side-table
+        features = output_fc.get("features", [])
+
+        def by_role(*roles):
+            return [features[i] for i in output_roles.select(*roles)]
+
+        rows = by_role(generator.ROLE_ROW)
+        turns = by_role(generator.ROLE_TURN_A, generator.ROLE_TURN_B)
+        dests = by_role(generator.ROLE_DESTINATION)
+
+        # rows and turns share the path budget in proportion to their counts
+        path_total = len(rows) + len(turns)
+        for name, feats, color in (("Rows", rows, "#ff7f00"), ("Turns", turns, "#2ca02c")):
+            if not feats:
+                continue
+            cap = max(1, max_paths * len(feats) // path_total) if path_total > max_paths else len(feats)
+            layer, stride = _preview_layer(feats, cap)
+            if stride > 1:
+                notes.append(f"{name}: showing 1 in {stride} of {len(feats)}")
+            folium.GeoJson(layer, name=name, smooth_factor=PREVIEW_SMOOTH_FACTOR,
+                           style_function=lambda x, color=color: {"color": color, "weight": 2},
+                           tooltip=folium.GeoJsonTooltip(fields=["name"], labels=False)).add_to(m)
         if dests:
-            for d in dests:
-                geom = d.get("geometry")
-                coords = geom.get("coordinates")
-                folium.CircleMarker(location=[coords[1], coords[0]], radius=4, color="#1f78b4",
-                                    fill=True, fill_color="#1f78b4", popup=d.get("properties", {}).get("name", "")).add_to(m)
-        if turns:
-            add_geojson_to_map(m, {"type": "FeatureCollection", "features": turns}, "Turns",
-                               style={"color": "#2ca02c", "weight": 2})
+            # one GeoJSON layer rendered as circle markers instead of a marker object per point
+            layer, stride = _preview_layer(dests, max_destinations)
+            if stride > 1:
+                notes.append(f"Destinations: showing 1 in {stride} of {len(dests)}")
+            folium.GeoJson(layer, name="Destinations",
+                           marker=folium.CircleMarker(radius=4, color="#1f78b4", fill=True,
+                                                      fill_color="#1f78b4", fill_opacity=0.6),
+                           popup=folium.GeoJsonPopup(fields=["name"], labels=False)).add_to(m)
 
     folium.LayerControl().add_to(m)
-    return m
+    return m, notes
 
 
 st.title("🌾 Row Path Generator")
@@ -198,75 +285,41 @@ with col2:
     shape_fc = None
     turn_fc = None
 
-    # Load AB Line (pasted or uploaded or example)
+    example_area, example_ab = (load_example_fields(str(EXAMPLE_PATH), EXAMPLE_PATH.stat().st_mtime)
+                                if use_example and EXAMPLE_PATH.exists() else (None, None))
+
+    # Load AB Line (pasted or example)
     if pasted_line and pasted_line.strip():
         try:
-            parsed = json.loads(pasted_line)
-            # Allow either a Feature or a FeatureCollection
-            if parsed.get("type") == "Feature":
-                line_fc = parsed
-            elif parsed.get("type") == "FeatureCollection":
-                # pick first LineString feature
-                for f in parsed.get("features", []):
-                    if f.get("geometry", {}).get("type") == "LineString":
-                        line_fc = f
-                        break
-            else:
-                # if raw geometry passed
-                if parsed.get("type") == "LineString":
-                    line_fc = {"type": "Feature", "geometry": parsed, "properties": {}}
+            line_fc = pick_feature(parse_geojson(pasted_line), "LineString")
         except Exception as e:
             st.error(f"Could not parse Line GeoJSON: {str(e)}")
             line_fc = None
-    elif use_example and EXAMPLE_PATH.exists():
-        try:
-            ex = json.loads(EXAMPLE_PATH.read_text())
-            for f in ex.get("features", []):
-                if f.get("geometry", {}).get("type") == "LineString":
-                    line_fc = f
-                    break
-        except Exception:
-            line_fc = None
+    elif example_ab:
+        line_fc = example_ab
 
     # Load Shape/Area (pasted or example)
     shape_fc = None
     if pasted_shape and pasted_shape.strip():
         try:
-            parsed = json.loads(pasted_shape)
-            if parsed.get("type") == "Feature":
-                shape_fc = parsed
-            elif parsed.get("type") == "FeatureCollection":
-                for f in parsed.get("features", []):
-                    if f.get("geometry", {}).get("type") == "Polygon":
-                        shape_fc = f
-                        break
-            else:
-                if parsed.get("type") == "Polygon":
-                    shape_fc = {"type": "Feature", "geometry": parsed, "properties": {}}
+            shape_fc = pick_feature(parse_geojson(pasted_shape), "Polygon")
         except Exception as e:
             st.error(f"Could not parse Area GeoJSON: {str(e)}")
             shape_fc = None
-    elif use_example and EXAMPLE_PATH.exists():
-        try:
-            ex = json.loads(EXAMPLE_PATH.read_text())
-            for f in ex.get("features", []):
-                if f.get("geometry", {}).get("type") == "Polygon":
-                    shape_fc = f
-                    break
-        except Exception:
-            shape_fc = None
+    elif example_area:
+        shape_fc = example_area
 
     # Load Primary Turn (pasted or example)
     turn_fc = None
     if pasted_turn and pasted_turn.strip():
         try:
-            turn_fc = json.loads(pasted_turn)
+            turn_fc = parse_geojson(pasted_turn)
         except Exception as e:
             st.error(f"Could not parse Turn A GeoJSON: {str(e)}")
             turn_fc = None
     elif use_example and EXAMPLE_TURN.exists():
         try:
-            turn_fc = json.loads(EXAMPLE_TURN.read_text())
+            turn_fc = load_example(str(EXAMPLE_TURN), EXAMPLE_TURN.stat().st_mtime)
         except Exception:
             turn_fc = None
     
@@ -274,7 +327,7 @@ with col2:
     turn2_fc = None
     if pasted_turn2 and pasted_turn2.strip():
         try:
-            turn2_fc = json.loads(pasted_turn2)
+            turn2_fc = parse_geojson(pasted_turn2)
         except Exception as e:
             st.error(f"Could not parse Turn B GeoJSON: {str(e)}")
             turn2_fc = None
@@ -288,6 +341,44 @@ with col2:
     # persist output across reruns using session_state
     output_fc = st.session_state.get("output_fc", None)
 
+    # Labeling, destination and turn settings only affect the downstream stages; the
+    # geometry stage (projection, clipping, row back-projection) is cached under its
+    # geometry key and reused until the area, AB line or spacing change.
+    downstream_params = dict(
+        start_letter=start_letter or "S",
+        start_num=int(start_num),
+        zero_pad=bool(zero_pad),
+        dual_zone=bool(dual_zone),
+        dest_side=dest_side,
+        custom_turn_geojson=turn_fc,
+        keep_start_letter=True,
+        attach_turns_both_ends=bool(turn_at_a or turn_at_b),
+        flip_start_horizontal=flip_a_h,
+        flip_start_vertical=flip_a_v,
+        flip_end_horizontal=flip_b_h,
+        flip_end_vertical=flip_b_v,
+        secondary_turn_geojson=turn2_fc,
+        turn_side_a="A" if turn_at_a else "None",
+        turn_side_b="B" if turn_at_b else "None",
+        rotation_offset_a=rotation_a,
+        rotation_offset_b=rotation_b,
+    )
+    geometry_key = None
+    if area_feat and ab_feat:
+        geometry_key = generator.geometry_key(area_feat, ab_feat, spacing_m=spacing_m)
+
+    def run_generation():
+        geometry = cached_geometry(geometry_key, area_feat, ab_feat, spacing_m)
+        key = generator.generation_key(area_feat, ab_feat, spacing_m=spacing_m, **downstream_params)
+        result, roles = cached_rows(key, geometry_key, geometry, downstream_params)
+        st.session_state["geometry_key"] = geometry_key
+        st.session_state["output_key"] = key
+        st.session_state["output_fc"] = result
+        st.session_state["output_roles"] = roles
+        st.session_state["output_params"] = downstream_params
+        st.session_state["last_error"] = None
+        return result
+
     # generate when button pressed
     if generate_btn:
         # use the separated inputs (line_fc / shape_fc) rather than an aggregated `fc`
@@ -295,81 +386,104 @@ with col2:
             st.error("Please provide both an AB Line and a Shape/Area before generating.")
         else:
             try:
-                result = generator.generate_rows_geojson(
-                    area_feature=area_feat,
-                    ab_feature=ab_feat,
-                    spacing_m=spacing_m,
-                    start_letter=start_letter or "S",
-                    start_num=int(start_num),
-                    zero_pad=bool(zero_pad),
-                    dual_zone=bool(dual_zone),
-                    dest_side=dest_side,
-                    custom_turn_geojson=turn_fc,
-                    keep_start_letter=True,
-                    attach_turns_both_ends=bool(turn_at_a or turn_at_b),
-                    flip_start_horizontal=flip_a_h,
-                    flip_start_vertical=flip_a_v,
-                    flip_end_horizontal=flip_b_h,
-                    flip_end_vertical=flip_b_v,
-                    secondary_turn_geojson=turn2_fc,
-                    turn_side_a="A" if turn_at_a else "None",
-                    turn_side_b="B" if turn_at_b else "None",
-                    rotation_offset_a=rotation_a,
-                    rotation_offset_b=rotation_b,
-                )
-                st.session_state["output_fc"] = result
-                st.session_state["last_error"] = None
-                output_fc = result
+                # opt-in profiling (ROWGEN_PROFILE_DIR / ROWGEN_PROFILE_EVERY)
+                profile_key = lambda: generator.generation_key(area_feat, ab_feat, spacing_m=spacing_m,
+                                                               **downstream_params)
+                with profiling.profiled(profile_key, "app"):
+                    output_fc = run_generation()
                 st.success("✅ Rows generated successfully!")
             except Exception as e:
                 st.session_state["output_fc"] = None
                 st.session_state["last_error"] = str(e)
                 st.exception(e)
                 output_fc = None
-
-    # Always render preview with any generated output (or None)
-    preview_map = render_preview_map(area_feat, ab_feat, output_fc)
-    st_folium(preview_map, width=900, height=600)
+    elif (output_fc and geometry_key is not None
+          and st.session_state.get("geometry_key") == geometry_key
+          and st.session_state.get("output_params") != downstream_params):
+        # only labeling / destination / turn settings changed: rerun the cheap stages live
+        try:
+            output_fc = run_generation()
+        except Exception as e:
+            st.session_state["last_error"] = str(e)
+            st.exception(e)
+
+    with st.expander("Preview limits", expanded=False):
+        col_paths, col_dests = st.columns(2)
+        with col_paths:
+            max_paths = st.number_input("Max paths", min_value=100, value=PREVIEW_MAX_PATHS, step=100)
+        with col_dests:
+            max_destinations = st.number_input("Max destinations", min_value=100,
+                                               value=PREVIEW_MAX_DESTINATIONS, step=100)
+
+    # Render the preview once there is an input or output to show
+    if area_feat or ab_feat or output_fc:
+        from streamlit_folium import st_folium
+
+        preview_map, preview_notes = render_preview_map(area_feat, ab_feat, output_fc,
+                                                        st.session_state.get("output_roles"),
+                                                        int(max_paths), int(max_destinations))
+        if preview_notes:
+            st.warning("Preview downsampled (export is complete): " + "; ".join(preview_notes))
+        # nothing is read back from the map, so skip the per-rerun state round-trip
+        st_folium(preview_map, width=900, height=600, returned_objects=[])
 
     if output_fc:
         st.markdown("### 💾 Export Results")
         
-        # Export NetworkPath and NetworkDestination features (exclude area)
-        filtered_features = [
-            f for f in output_fc.get("features", [])
-            if f.get("properties", {}).get("type") in ("NetworkPath", "NetworkDestination", "RowPath", "DestinationPoint", "TurnAttachment")
-        ]
-        filtered_fc = {"type": "FeatureCollection", "features": filtered_features}
-        out_text = json.dumps(filtered_fc, indent=2)
-
-        col_dl, col_copy = st.columns(2)
-        with col_dl:
-            st.download_button("📥 Download", data=out_text, file_name="rows_output.geojson",
-                             mime="application/json", use_container_width=True)
-        with col_copy:
-            # embed JSON safely into the copy script using json.dumps (proper escaping)
-            escaped_json = json.dumps(out_text)
-            copy_button_html = (
-                '<div style=\"margin-top:0px;\">\\n'
-                '<button id=\"copy-btn\" style=\"width:100%;height:38px;padding:0.25rem 0.75rem;background:#ff4b4b;color:white;border:none;border-radius:0.5rem;cursor:pointer;font-size:1rem;font-weight:400;line-height:1.6;\">📋 Copy</button>\\n'
-                '<div id=\"toast\" style=\"display:none;position:fixed;top:20px;right:20px;background:#21c354;color:white;padding:12px 24px;border-radius:8px;box-shadow:0 4px 6px rgba(0,0,0,0.1);z-index:9999;font-size:14px;\">✅ Copied to clipboard!</div>\\n'
-                '</div>\\n'
-                '<script>\\n'
-                'const text = ' + escaped_json + ';\\n'
-                'const btn = document.getElementById(\"copy-btn\");\\n'
-                'const toast = document.getElementById(\"toast\");\\n'
-                'btn.addEventListener(\"click\", async () => {\\n'
-                '  try {\\n'
-                '    await navigator.clipboard.writeText(text);\\n'
-                '    toast.style.display = \"block\";\\n'
-                '    setTimeout(()=>{toast.style.display=\"none\";},2000);\\n'
-                '  } catch(e) {\\n'
-                '    alert(\"Copy failed: \" + e);\\n'
-                '  }\\n'
-                '});\\n'
-                '</script>'
-            )
-            st.components.v1.html(copy_button_html, height=38)
-
-        with st.expander("📄 View Raw GeoJSON", expanded=False):
-            st.text_area("GeoJSON Output", value=out_text, height=300, label_visibility="collapsed")
\ No newline at end of file
+        col_prec, col_compact = st.columns(2)
+        with col_prec:
+            export_precision = st.number_input("Decimals", min_value=0, max_value=15,
+                                               value=geojson_io.DEFAULT_PRECISION, step=1)
+        with col_compact:
+            export_compact = st.checkbox("Compact", value=False)
+        export_include = st.multiselect("Include", options=list(EXPORT_ROLES), default=list(EXPORT_ROLES))
+
+        # Payloads are only built (and sent to the browser) once asked for, and are
+        # serialized once per result and format. The request is consumed by the run that
+        # renders it, so later reruns (any other widget change) do not ship it again.
+        export_request = (st.session_state.get("output_key"), int(export_precision), bool(export_compact),
+                          tuple(export_include))
+        if st.button("📦 Prepare export", use_container_width=True):
+            st.session_state["export_request"] = export_request
+
+        if st.session_state.pop("export_request", None) == export_request:
+            out_text = export_text(*export_request, output_fc, st.session_state.get("output_roles"))
+
+            col_dl, col_copy = st.columns(2)
+            with col_dl:
+                st.download_button("📥 Download", data=out_text, file_name="rows_output.geojson",
+                                 mime="application/json", use_container_width=True)
+            with col_copy:
+                # embed JSON safely into the copy script using json.dumps (proper escaping)
+                escaped_json = json.dumps(out_text)
+                copy_button_html = (
+                    '<div style=\"margin-top:0px;\">\\n'
+                    '<button id=\"copy-btn\" style=\"width:100%;height:38px;padding:0.25rem 0.75rem;background:#ff4b4b;color:white;border:none;border-radius:0.5rem;cursor:pointer;font-size:1rem;font-weight:400;line-height:1.6;\">📋 Copy</button>\\n'
+                    '<div id=\"toast\" style=\"display:none;position:fixed;top:20px;right:20px;background:#21c354;color:white;padding:12px 24px;border-radius:8px;box-shadow:0 4px 6px rgba(0,0,0,0.1);z-index:9999;font-size:14px;\">✅ Copied to clipboard!</div>\\n'
+                    '</div>\\n'
+                    '<script>\\n'
+                    'const text = ' + escaped_json + ';\\n'
+                    'const btn = document.getElementById(\"copy-btn\");\\n'
+                    'const toast = document.getElementById(\"toast\");\\n'
+                    'btn.addEventListener(\"click\", async () => {\\n'
+                    '  try {\\n'
+                    '    await navigator.clipboard.writeText(text);\\n'
+                    '    toast.style.display = \"block\";\\n'
+                    '    setTimeout(()=>{toast.style.display=\"none\";},2000);\\n'
+                    '  } catch(e) {\\n'
+                    '    alert(\"Copy failed: \" + e);\\n'
+                    '  }\\n'
+                    '});\\n'
+                    '</script>'
+                )
+                st.components.v1.html(copy_button_html, height=38)
+            st.caption("Export buttons are cleared on the next change; prepare again if needed.")
+
+        # raw view: a checkbox rather than an expander, so nothing is sent while it is closed
+        if st.checkbox("📄 View Raw GeoJSON", value=False):
+            out_text = export_text(*export_request, output_fc, st.session_state.get("output_roles"))
+            pages = max(1, -(-len(out_text) // RAW_PAGE_CHARS))
+            page = st.number_input(f"Page (of {pages})", min_value=1, max_value=pages, value=1, step=1) if pages > 1 else 1
+            offset = (int(page) - 1) * RAW_PAGE_CHARS
+            st.text_area("GeoJSON Output", value=out_text[offset:offset + RAW_PAGE_CHARS], height=300,
+                         label_visibility="collapsed")
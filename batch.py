@@ -0,0 +1,364 @@
+"""
+Batch row generation for whole directories of fields.
+
+    python batch.py fields/ "more/*.geojson" --params params.json --out-dir out/
+
+Each input FeatureCollection (one Polygon + one AB LineString) is generated in a
+process pool with the keyword arguments from the params file and written to
+`<out-dir>/<name>.rows.geojson` (`<folder>_<name>` when two inputs share a name). A
+`manifest.json` with per-field timings, feature counts and errors is written next to
+the outputs.
+
+    python batch.py farm.geojson --multi-field --out-dir out/
+
+With --multi-field each input is a whole farm export: every AB line is paired with
+the polygon that contains, intersects or (within --pair-distance) borders it, the
+fields are generated in parallel and written as one network with globally unique
+labels to `<out-dir>/<name>.network.geojson`.
+"""
+import argparse
+import glob
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+import numpy as np
+import shapely
+from shapely.geometry import shape
+
+import generator
+import geojson_io
+
+# Parameters whose values may be given as paths to GeoJSON files
+_TURN_PARAMS = ("custom_turn_geojson", "secondary_turn_geojson")
+
+# How far outside a polygon an AB line may lie and still be paired with it (metres)
+PAIR_DISTANCE_M = 5.0
+
+
+def load_params(path: Optional[str]) -> dict:
+    """
+    Read generator keyword arguments from a JSON file. Turn templates may be given
+    inline or as paths relative to the params file.
+    """
+    if not path:
+        return {}
+    params_path = Path(path)
+    params = json.loads(params_path.read_text())
+    for name in _TURN_PARAMS:
+        value = params.get(name)
+        if isinstance(value, str):
+            params[name] = json.loads((params_path.parent / value).read_text())
+    # fail early on unknown or misspelled parameters and invalid values
+    generator.validate_params(**params)
+    return params
+
+
+def expand_inputs(inputs: List[str]) -> List[Path]:
+    """Expand directories (their *.geojson / *.json files) and glob patterns into input files."""
+    paths = []
+    for item in inputs:
+        if os.path.isdir(item):
+            for pattern in ("*.geojson", "*.json"):
+                paths.extend(sorted(Path(item).glob(pattern)))
+        else:
+            paths.extend(Path(p) for p in sorted(glob.glob(item)))
+    # keep first occurrence of each file
+    unique = []
+    seen = set()
+    for path in paths:
+        if path.resolve() not in seen:
+            seen.add(path.resolve())
+            unique.append(path)
+    return unique
+
+
+def output_paths(paths: List[Path], out_dir, suffix: str) -> List[Path]:
+    """
+    Output path of each input: `<out_dir>/<stem><suffix>`, or `<parent>_<stem><suffix>`
+    when several inputs share a stem (e.g. a/field.geojson and b/field.geojson), with a
+    numeric suffix if that still collides. Never maps two inputs to one file.
+    """
+    out_dir = Path(out_dir)
+    stems = {}
+    for path in paths:
+        stems[path.stem] = stems.get(path.stem, 0) + 1
+    used = set()
+    outputs = []
+    for path in paths:
+        name = path.stem if stems[path.stem] == 1 else f"{path.resolve().parent.name}_{path.stem}"
+        candidate, n = name, 1
+        while candidate in used:
+            n += 1
+            candidate = f"{name}_{n}"
+        used.add(candidate)
+        outputs.append(out_dir / f"{candidate}{suffix}")
+    return outputs
+
+
+def run_field(in_path: str, out_path: str, params: dict, precision: Optional[int] = None,
+              compact: bool = False) -> dict:
+    """Generate one field and write its output; returns a manifest entry (never raises)."""
+    entry = {"input": str(in_path), "output": None, "status": "ok", "error": None}
+    start = time.perf_counter()
+    try:
+        area, ab = geojson_io.read_area_and_ab(in_path)
+        if area is None or ab is None:
+            raise ValueError("Input must contain one Polygon and one LineString (AB).")
+        stats = generator.GenerationStats()
+        features = generator.iter_row_features(area, ab, stats=stats, **params)
+        entry["features"] = geojson_io.write_feature_collection(
+            features, out_path, precision=precision, compact=compact)
+        entry["rows"] = stats.segments
+        entry["output"] = str(out_path)
+        entry["stats"] = stats.as_dict()
+    except Exception as e:
+        entry["status"] = "error"
+        entry["error"] = f"{type(e).__name__}: {e}"
+    entry["seconds"] = round(time.perf_counter() - start, 4)
+    return entry
+
+
+# Metres per degree of latitude, for the pairing tolerance
+_M_PER_DEG = 111_320.0
+
+
+def pair_fields(areas: List[dict], abs_: List[dict],
+                max_distance_m: float = PAIR_DISTANCE_M) -> Tuple[List[Tuple[int, int]], List[int], List[int]]:
+    """
+    Pair AB lines with field polygons through an STRtree over the polygons.
+
+    An AB line belongs to the smallest polygon that contains it, else to the polygon it
+    overlaps over the longest length, else to the nearest polygon within
+    `max_distance_m` (AB lines are often drawn along the field edge). A polygon claimed
+    by several AB lines keeps the one with the longest overlap, then the nearest.
+    Returns (pairs, unpaired_areas, unpaired_abs) with pairs as (area index, ab index)
+    in polygon order and the leftovers as indices.
+    """
+    polygons = np.array([shape(feat["geometry"]) for feat in areas], dtype=object)
+    lines = np.array([shape(feat["geometry"]) for feat in abs_], dtype=object)
+    if len(polygons) and len(lines):
+        # degrees of latitude; never wider than max_distance_m along longitude
+        line_idx, poly_idx = shapely.STRtree(polygons).query(
+            lines, predicate="dwithin", distance=max_distance_m / _M_PER_DEG)
+    else:
+        line_idx = poly_idx = np.empty(0, dtype=int)
+    contains = shapely.contains(polygons[poly_idx], lines[line_idx])
+    overlap = shapely.length(shapely.intersection(lines[line_idx], polygons[poly_idx]))
+    distance = shapely.distance(lines[line_idx], polygons[poly_idx])
+    area = shapely.area(polygons[poly_idx])
+
+    # best polygon per AB line
+    best = {}
+    for line, poly, inside, length, gap, size in zip(line_idx.tolist(), poly_idx.tolist(), contains.tolist(),
+                                                     overlap.tolist(), distance.tolist(), area.tolist()):
+        rank = (inside, -size if inside else length, -gap)
+        if line not in best or rank > best[line][0]:
+            best[line] = (rank, poly, (length, -gap))
+
+    # best AB line per polygon, ties going to the earlier line
+    claims = {}
+    for line, (_, poly, rank) in sorted(best.items()):
+        if poly not in claims or rank > claims[poly][1]:
+            claims[poly] = (line, rank)
+
+    pairs = [(poly, claims[poly][0]) for poly in sorted(claims)]
+    paired_lines = {line for _, line in pairs}
+    return (pairs, [i for i in range(len(areas)) if i not in claims],
+            [i for i in range(len(abs_)) if i not in paired_lines])
+
+
+def _prepare_field(area: dict, ab: dict, spacing_m: float, clip_method: str):
+    """Geometry stage of one field for `generate_network` (returns the error instead of raising)."""
+    stats = generator.GenerationStats()
+    try:
+        return generator.prepare_geometry(area, ab, spacing_m, clip_method, stats), stats, None
+    except Exception as e:
+        return None, stats, f"{type(e).__name__}: {e}"
+
+
+def _feature_name(feature: dict, index: int):
+    properties = feature.get("properties") or {}
+    return feature.get("id") or properties.get("name") or properties.get("fieldName") or index
+
+
+def generate_network(areas: List[dict], abs_: List[dict], params: dict, workers: Optional[int] = None,
+                     max_distance_m: float = PAIR_DISTANCE_M):
+    """
+    Generate many fields into one network.
+
+    AB lines are paired with polygons by `pair_fields`, the geometry stage of every
+    field runs across a process pool, and labels, destinations and turns are then built
+    field by field in polygon order with `start_num` continuing from the previous field,
+    so labels stay unique across the network. Fields that fail are reported and skipped.
+
+    Returns (features, report): an iterator over the merged output features and a dict
+    with one entry per field plus the unpaired polygons and AB lines.
+    """
+    params = dict(params)
+    pairs, unpaired_areas, unpaired_abs = pair_fields(areas, abs_, max_distance_m)
+    bound = generator._bind_params({}, {}, params)
+    spacing_m, clip_method = bound["spacing_m"], bound["clip_method"]
+    params.pop("spacing_m", None)
+    params.pop("clip_method", None)
+
+    jobs = [(areas[a], abs_[b], spacing_m, clip_method) for a, b in pairs]
+    workers = workers or os.cpu_count() or 1
+    if workers > 1 and len(jobs) > 1:
+        with ProcessPoolExecutor(max_workers=min(workers, len(jobs))) as pool:
+            prepared = list(pool.map(_prepare_field, *zip(*jobs)))
+    else:
+        prepared = [_prepare_field(*job) for job in jobs]
+
+    numbers_per_row = 2 if bound["dual_zone"] else 1
+    number = bound["start_num"]
+    rowsets = []
+    fields = []
+    for (a, b), (geometry, stats, error) in zip(pairs, prepared):
+        entry = {"area": _feature_name(areas[a], a), "ab": _feature_name(abs_[b], b),
+                 "status": "ok", "error": error}
+        if geometry is not None:
+            try:
+                rowset = generator.build_rows(geometry, stats=stats, **{**params, "start_num": number})
+            except Exception as e:
+                entry["error"] = f"{type(e).__name__}: {e}"
+            else:
+                entry["start_num"] = number
+                entry["rows"] = rowset.row_count
+                number += rowset.row_count * numbers_per_row
+                rowsets.append(rowset)
+        if entry["error"]:
+            entry["status"] = "error"
+        entry["stats"] = stats.as_dict()
+        fields.append(entry)
+
+    report = {
+        "fields": fields,
+        "unpaired_areas": [_feature_name(areas[i], i) for i in unpaired_areas],
+        "unpaired_abs": [_feature_name(abs_[i], i) for i in unpaired_abs],
+    }
+    features = (feat for rowset in rowsets for feat in rowset.iter_features(by_row=True))
+    return features, report
+
+
+def run_network(in_path: str, out_path: str, params: dict, workers: Optional[int] = None,
+                precision: Optional[int] = None, compact: bool = False,
+                max_distance_m: float = PAIR_DISTANCE_M) -> dict:
+    """Generate every field of one multi-field input into one network file; returns a manifest entry."""
+    entry = {"input": str(in_path), "output": None, "status": "ok", "error": None}
+    start = time.perf_counter()
+    try:
+        areas, abs_ = geojson_io.read_areas_and_abs(in_path)
+        features, report = generate_network(areas, abs_, params, workers, max_distance_m)
+        if not any(field["status"] == "ok" for field in report["fields"]):
+            raise ValueError("No field could be generated (need Polygons with nearby AB LineStrings).")
+        entry["features"] = geojson_io.write_feature_collection(
+            features, out_path, precision=precision, compact=compact)
+        entry["output"] = str(out_path)
+        entry["rows"] = sum(field.get("rows", 0) for field in report["fields"])
+        entry.update(report)
+        if any(field["status"] != "ok" for field in report["fields"]):
+            entry["status"] = "partial"
+    except Exception as e:
+        entry["status"] = "error"
+        entry["error"] = f"{type(e).__name__}: {e}"
+    entry["seconds"] = round(time.perf_counter() - start, 4)
+    return entry
+
+
+def run_batch(paths: List[Path], out_dir, params: dict, workers: Optional[int] = None,
+              precision: Optional[int] = None, compact: bool = False) -> dict:
+    """Generate every field in `paths` across a process pool and return the manifest."""
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    workers = workers or os.cpu_count() or 1
+    started = time.perf_counter()
+
+    entries = []
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [
+            pool.submit(run_field, str(path), str(out_path), params, precision, compact)
+            for path, out_path in zip(paths, output_paths(paths, out_dir, ".rows.geojson"))
+        ]
+        for future in as_completed(futures):
+            entry = future.result()
+            entries.append(entry)
+            print(f"[{entry['status']}] {entry['input']} ({entry['seconds']:.2f}s)", file=sys.stderr)
+
+    entries.sort(key=lambda e: e["input"])
+    return {
+        "params": {k: v for k, v in params.items() if k not in _TURN_PARAMS},
+        "workers": workers,
+        "seconds": round(time.perf_counter() - started, 4),
+        "succeeded": sum(e["status"] == "ok" for e in entries),
+        "failed": sum(e["status"] != "ok" for e in entries),
+        "fields": entries,
+    }
+
+
+def run_multi_batch(paths: List[Path], out_dir, params: dict, workers: Optional[int] = None,
+                    precision: Optional[int] = None, compact: bool = False,
+                    max_distance_m: float = PAIR_DISTANCE_M) -> dict:
+    """Run `run_network` on each multi-field input in turn (fields run in parallel) and return the manifest."""
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    workers = workers or os.cpu_count() or 1
+    started = time.perf_counter()
+
+    entries = []
+    for path, out_path in zip(paths, output_paths(paths, out_dir, ".network.geojson")):
+        entry = run_network(str(path), str(out_path), params, workers, precision, compact, max_distance_m)
+        entries.append(entry)
+        print(f"[{entry['status']}] {entry['input']}: {len(entry.get('fields', []))} fields "
+              f"({entry['seconds']:.2f}s)", file=sys.stderr)
+
+    return {
+        "params": {k: v for k, v in params.items() if k not in _TURN_PARAMS},
+        "workers": workers,
+        "seconds": round(time.perf_counter() - started, 4),
+        "succeeded": sum(e["status"] == "ok" for e in entries),
+        "failed": sum(e["status"] != "ok" for e in entries),
+        "fields": entries,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate row networks for many fields in parallel.")
+    parser.add_argument("inputs", nargs="+", help="input files, directories or glob patterns")
+    parser.add_argument("--params", help="JSON file with generate_rows keyword arguments")
+    parser.add_argument("--out-dir", required=True, help="directory for outputs and manifest.json")
+    parser.add_argument("--workers", type=int, help="worker processes (default: CPU count)")
+    parser.add_argument("--precision", type=int, default=geojson_io.DEFAULT_PRECISION,
+                        help="coordinate decimal places (-1 keeps full precision)")
+    parser.add_argument("--compact", action="store_true", help="omit optional whitespace")
+    parser.add_argument("--multi-field", action="store_true",
+                        help="treat each input as many fields (Polygons paired with AB lines) "
+                             "and write one merged network per input")
+    parser.add_argument("--pair-distance", type=float, default=PAIR_DISTANCE_M,
+                        help="max metres between an AB line and its polygon in --multi-field mode")
+    args = parser.parse_args(argv)
+
+    paths = expand_inputs(args.inputs)
+    if not paths:
+        parser.error("no input files found")
+    params = load_params(args.params)
+    precision = args.precision if args.precision >= 0 else None
+
+    if args.multi_field:
+        manifest = run_multi_batch(paths, args.out_dir, params, args.workers, precision, args.compact,
+                                   args.pair_distance)
+    else:
+        manifest = run_batch(paths, args.out_dir, params, args.workers, precision, args.compact)
+    manifest_path = Path(args.out_dir) / "manifest.json"
+    manifest_path.write_text(json.dumps(manifest, indent=2))
+    print(f"{manifest['succeeded']} succeeded, {manifest['failed']} failed in "
+          f"{manifest['seconds']:.2f}s; manifest: {manifest_path}", file=sys.stderr)
+    return 1 if manifest["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,329 @@
+"""
+Benchmarks for row generation on synthetic fields.
+
+    python bench.py -o bench.json [--repeat 5] [--quick] [--case wide]
+    python bench.py --startup
+
+Each case builds a synthetic field (vertex count, holes, concavity, width in rows,
+AB angle, turn template complexity), times `generate_rows_geojson` end to end and
+per stage (the `generator.GenerationStats` stages plus serialization), and measures peak traced memory in a separate run. Results are written as JSON so
+runs before and after a change can be compared.
+
+`--startup` instead checks cold-start cost: import times of generator / geojson_io
+and a cold CLI run on a small field against STARTUP_BUDGETS, and that modules listed
+in DEFERRED_IMPORTS are not loaded at import time.
+"""
+import argparse
+import json
+import math
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import List, Optional
+
+import numpy as np
+import shapely
+from shapely import affinity
+from shapely.geometry import LineString, Polygon, mapping
+
+import generator
+import geojson_io
+
+# Where synthetic fields are placed (near the example field)
+ORIGIN_LON = -75.19
+ORIGIN_LAT = 39.51
+
+SUITE = [
+    dict(name="small", vertices=16, width_rows=50),
+    dict(name="medium", vertices=64, width_rows=500, turn_vertices=8),
+    dict(name="wide", vertices=64, width_rows=3000, turn_vertices=8),
+    dict(name="detailed", vertices=4096, width_rows=500, turn_vertices=8),
+    dict(name="concave", vertices=128, width_rows=500, concavity=0.4, turn_vertices=8),
+    dict(name="holes", vertices=256, width_rows=500, holes=20, turn_vertices=8),
+    dict(name="rotated", vertices=64, width_rows=500, ab_angle_deg=37.0, turn_vertices=8),
+    dict(name="complex_turns", vertices=64, width_rows=500, turn_vertices=256),
+]
+# Scaled down rather than capped so the quick cases stay distinct (50, 100 and 600 rows)
+QUICK_SUITE = [dict(case, width_rows=max(case["width_rows"] // 5, 50)) for case in SUITE[:3]]
+
+# Field outlines `synthetic_field` can build
+SYNTHETIC_SHAPES = ("ellipse", "rect", "notched")
+
+# Cold-start budgets in seconds (fresh interpreter, best of --repeat) checked by --startup
+STARTUP_BUDGETS = {
+    "import generator": 0.5,
+    "import geojson_io": 0.1,
+    "cli small field": 1.0,
+}
+# Modules that importing each of ours must not load (deferred to first use)
+DEFERRED_IMPORTS = {
+    "generator": ("pyproj", "concurrent.futures", "cProfile", "tracemalloc"),
+    "geojson_io": ("numpy", "shapely", "pyproj"),
+    "profiling": ("cProfile", "tracemalloc"),
+}
+
+
+def _to_wgs84_feature(geom, transformer, properties=None) -> dict:
+    return {"type": "Feature", "properties": properties or {},
+            "geometry": mapping(generator.project(geom, transformer))}
+
+
+def synthetic_field(vertices: int = 64, holes: int = 0, concavity: float = 0.0,
+                    width_rows: int = 100, ab_angle_deg: float = 0.0, spacing_m: float = 6.0,
+                    aspect: float = 0.5, lon: float = ORIGIN_LON, lat: float = ORIGIN_LAT,
+                    shape: str = "ellipse"):
+    """
+    Return (area_feature, ab_feature) in WGS84: a field `width_rows` rows wide (across
+    AB) with `holes` small circular holes off the AB line, and AB through the middle
+    rotated by `ab_angle_deg`. `shape` is one of SYNTHETIC_SHAPES: "ellipse" has
+    `vertices` boundary vertices, every other one pulled inward by `concavity` (0..1);
+    "rect" is a rectangle and "notched" a rectangle with a notch cut into the far side.
+    Both rectangular shapes have edges parallel to AB on row offsets, so some rows run
+    exactly along the boundary; `vertices` and `concavity` only apply to "ellipse".
+    """
+    if shape not in SYNTHETIC_SHAPES:
+        raise ValueError(f"shape must be one of {SYNTHETIC_SHAPES}, got {shape!r}")
+    width = width_rows * spacing_m
+    length = width * aspect
+    if shape == "ellipse":
+        theta = np.linspace(0.0, 2.0 * math.pi, vertices, endpoint=False)
+        radius = np.where(np.arange(vertices) % 2 == 1, 1.0 - concavity, 1.0)
+        # the field's long axis runs across AB so that it spans `width_rows` rows
+        shell = np.column_stack([radius * np.cos(theta) * length / 2, radius * np.sin(theta) * width / 2])
+    else:
+        # rows sit at multiples of spacing_m from AB, so the edges land on rows
+        top = (width_rows // 2) * spacing_m
+        bottom = top - width_rows * spacing_m
+        shell = [(-length / 2, bottom), (length / 2, bottom), (length / 2, top)]
+        if shape == "notched":
+            # clear of the holes (|x| <= 0.2 * length) and of AB (y = 0)
+            depth = max(width_rows // 4, 1) * spacing_m
+            shell += [(length * 0.4, top), (length * 0.4, top - depth),
+                      (length * 0.25, top - depth), (length * 0.25, top)]
+        shell.append((-length / 2, top))
+
+    interiors = []
+    if holes:
+        hole_r = min(length, width) * 0.2 / max(holes, 1) ** 0.5
+        ys = np.linspace(-width * 0.35, width * 0.35, holes)
+        for y in ys:
+            if abs(y) < 2 * hole_r + spacing_m:
+                y += math.copysign(2 * hole_r + spacing_m, y or 1.0)
+            t = np.linspace(0.0, 2.0 * math.pi, 16, endpoint=False)
+            interiors.append(np.column_stack([hole_r * np.cos(t), y + hole_r * np.sin(t)]))
+
+    area = Polygon(shell, interiors)
+    if not area.is_valid:
+        area = area.buffer(0)
+    ab = LineString([(-length * 0.2, 0.0), (length * 0.2, 0.0)])
+
+    angle = math.radians(ab_angle_deg)
+    rotation = [math.cos(angle), -math.sin(angle), math.sin(angle), math.cos(angle), 0.0, 0.0]
+    area = affinity.affine_transform(area, rotation)
+    ab = affinity.affine_transform(ab, rotation)
+
+    utm = generator.get_utm_crs(lon, lat)
+    x0, y0 = generator.get_transformer("EPSG:4326", utm).transform(lon, lat)
+    area = affinity.translate(area, x0, y0)
+    ab = affinity.translate(ab, x0, y0)
+    to_wgs = generator.get_transformer(utm, "EPSG:4326")
+    return _to_wgs84_feature(area, to_wgs), _to_wgs84_feature(ab, to_wgs)
+
+
+def synthetic_turn(vertices: int = 8, radius_m: float = 3.0,
+                   lon: float = ORIGIN_LON, lat: float = ORIGIN_LAT) -> dict:
+    """A half-circle turn LineString with `vertices` points, anchored at its first point."""
+    utm = generator.get_utm_crs(lon, lat)
+    x0, y0 = generator.get_transformer("EPSG:4326", utm).transform(lon, lat)
+    t = np.linspace(0.0, math.pi, max(vertices, 2))
+    arc = LineString(np.column_stack([x0 + radius_m * np.sin(t), y0 + radius_m * (1.0 - np.cos(t))]))
+    feature = _to_wgs84_feature(arc, generator.get_transformer(utm, "EPSG:4326"),
+                                {"type": "NetworkPath"})
+    return {"type": "FeatureCollection", "features": [feature]}
+
+
+def _case_kwargs(case: dict) -> dict:
+    kwargs = {"spacing_m": case.get("spacing_m", 6.0), "clip_method": case.get("clip_method", "geos")}
+    if case.get("turn_vertices"):
+        turn = synthetic_turn(case["turn_vertices"])
+        kwargs.update(custom_turn_geojson=turn, secondary_turn_geojson=turn,
+                      attach_turns_both_ends=True)
+    return kwargs
+
+
+def _stage_times(area: dict, ab: dict, kwargs: dict):
+    """
+    Wall time of each stage of one generation run as recorded by
+    `generator.GenerationStats`, plus serialization; also (rows, features, output bytes).
+    """
+    stats = generator.GenerationStats()
+    fc = generator.generate_rows_geojson(area, ab, stats=stats, **kwargs)
+    t0 = time.perf_counter()
+    text = geojson_io.dumps(fc, compact=True)
+    times = dict(stats.stages)
+    times["serialize"] = time.perf_counter() - t0
+    return times, stats.segments, len(fc["features"]), len(text)
+
+
+def run_case(case: dict, repeat: int = 5) -> dict:
+    """Benchmark one case; times are medians over `repeat` runs."""
+    field_params = {k: v for k, v in case.items() if k not in ("name", "turn_vertices", "clip_method")}
+    area, ab = synthetic_field(**field_params)
+    kwargs = _case_kwargs(case)
+
+    # warm-up (transformer cache, imports)
+    generator.generate_rows_geojson(area, ab, **kwargs)
+
+    totals = []
+    stages: List[dict] = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        generator.generate_rows_geojson(area, ab, **kwargs)
+        totals.append(time.perf_counter() - t0)
+        times, rows, features, out_bytes = _stage_times(area, ab, kwargs)
+        stages.append(times)
+
+    tracemalloc.start()
+    generator.generate_rows_geojson(area, ab, **kwargs)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    total = statistics.median(totals)
+    return {
+        "name": case.get("name", ""),
+        "case": case,
+        "rows": rows,
+        "features": features,
+        "output_bytes": out_bytes,
+        "total_s": total,
+        "rows_per_s": rows / total if total else None,
+        "stages_s": {stage: statistics.median(t[stage] for t in stages) for stage in stages[0]},
+        "peak_mb": peak / 1e6,
+    }
+
+
+def run_suite(cases: List[dict], repeat: int = 5, log=sys.stderr) -> dict:
+    results = []
+    for case in cases:
+        result = run_case(case, repeat)
+        results.append(result)
+        if log:
+            print(f"{result['name']:>14}: {result['rows']:6d} rows  {result['total_s'] * 1000:8.1f} ms  "
+                  f"{result['rows_per_s']:9.0f} rows/s  {result['peak_mb']:7.1f} MB peak", file=log)
+    return {
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "shapely": shapely.__version__,
+        "geos": shapely.geos_version_string,
+        "repeat": repeat,
+        "cases": results,
+    }
+
+
+def _cold(code: str, repeat: int) -> float:
+    """Best wall time over `repeat` fresh interpreters of the time `code` reports."""
+    here = os.path.dirname(os.path.abspath(__file__))
+    times = []
+    for _ in range(repeat):
+        out = subprocess.run([sys.executable, "-c", code], cwd=here, check=True,
+                             capture_output=True, text=True).stdout
+        times.append(float(out.strip().splitlines()[-1]))
+    return min(times)
+
+
+def run_startup(repeat: int = 5, log=sys.stderr) -> dict:
+    """
+    Measure cold import and CLI times against STARTUP_BUDGETS and check that the
+    DEFERRED_IMPORTS stay unloaded. The CLI case runs `generator.py` on a small
+    synthetic field, including interpreter start-up.
+    """
+    timings = {
+        "import generator": _cold("import time; t = time.perf_counter(); import generator; "
+                                  "print(time.perf_counter() - t)", repeat),
+        "import geojson_io": _cold("import time; t = time.perf_counter(); import geojson_io; "
+                                   "print(time.perf_counter() - t)", repeat),
+    }
+    area, ab = synthetic_field(vertices=16, width_rows=50)
+    with tempfile.TemporaryDirectory() as tmp:
+        field_path = os.path.join(tmp, "field.geojson")
+        with open(field_path, "w") as f:
+            json.dump({"type": "FeatureCollection", "features": [area, ab]}, f)
+        cli = [sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), "generator.py"),
+               field_path, "-o", os.devnull]
+        runs = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            subprocess.run(cli, check=True)
+            runs.append(time.perf_counter() - started)
+        timings["cli small field"] = min(runs)
+
+    deferred = {}
+    for module, names in DEFERRED_IMPORTS.items():
+        code = f"import sys, {module}; print(','.join(m for m in {names!r} if m in sys.modules) or '-')"
+        out = subprocess.run([sys.executable, "-c", code], cwd=os.path.dirname(os.path.abspath(__file__)),
+                             check=True, capture_output=True, text=True).stdout.strip()
+        deferred[module] = [] if out == "-" else out.split(",")
+
+    over = [name for name, seconds in timings.items() if seconds > STARTUP_BUDGETS[name]]
+    eager = {module: loaded for module, loaded in deferred.items() if loaded}
+    if log:
+        for name, seconds in timings.items():
+            status = "OVER" if name in over else "ok"
+            print(f"{name:>18}: {seconds * 1000:7.1f} ms  (budget {STARTUP_BUDGETS[name] * 1000:.0f} ms) {status}",
+                  file=log)
+        for module, loaded in eager.items():
+            print(f"{module} loads deferred modules at import: {', '.join(loaded)}", file=log)
+    return {
+        "python": platform.python_version(),
+        "repeat": repeat,
+        "timings_s": timings,
+        "budgets_s": STARTUP_BUDGETS,
+        "over_budget": over,
+        "eager_imports": eager,
+        "ok": not over and not eager,
+    }
+
+
+def _write_report(report: dict, output: str):
+    text = json.dumps(report, indent=2)
+    if output == "-":
+        print(text)
+    else:
+        with open(output, "w") as f:
+            f.write(text + "\n")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark row generation on synthetic fields.")
+    parser.add_argument("-o", "--output", default="-", help="JSON results file (default: stdout)")
+    parser.add_argument("--repeat", type=int, default=5, help="timed runs per case")
+    parser.add_argument("--quick", action="store_true", help="small cases only")
+    parser.add_argument("--case", action="append", help="run only the named case(s)")
+    parser.add_argument("--clip-method", choices=generator.CLIP_METHODS, help="override clip_method")
+    parser.add_argument("--startup", action="store_true",
+                        help="check cold import / CLI times and deferred imports instead (exit 1 on failure)")
+    args = parser.parse_args(argv)
+
+    if args.startup:
+        report = run_startup(max(1, args.repeat))
+        _write_report(report, args.output)
+        return 0 if report["ok"] else 1
+
+    cases = QUICK_SUITE if args.quick else SUITE
+    if args.case:
+        cases = [case for case in cases if case["name"] in args.case]
+    if args.clip_method:
+        cases = [dict(case, clip_method=args.clip_method) for case in cases]
+
+    report = run_suite(cases, max(1, args.repeat))
+    _write_report(report, args.output)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
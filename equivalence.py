@@ -0,0 +1,306 @@
+"""
+Reference-vs-candidate equivalence harness for generated networks.
+
+    python equivalence.py --fields 2000 -o report.json
+    python equivalence.py --candidate '{"clip_method": "vectorized"}'
+    python equivalence.py --candidate-fn mymodule:fast_generate --workers 8
+
+Both sides run over a corpus of the example fields (Example/shape.geojson against the
+AB lines in Example/path.geojson and Example/combined.geojson, with and without the
+example turn) plus seeded synthetic fields from `bench.synthetic_field` (ellipses, and
+rectangular and notched fields whose edges run along rows). Each side is
+a function with the `generate_rows_geojson(area, ab, return_roles=True, **kwargs)`
+contract plus extra keyword arguments. The reference defaults to the original per-row
+implementation in `reference_generator` and the candidate to the current
+`generator.generate_rows_geojson`. Per field the harness compares row counts,
+labels, row endpoints and destinations within a tolerance, and turn geometries, and
+writes a JSON report listing every divergence. Exits 1 if any field diverges.
+"""
+import argparse
+import importlib
+import json
+import os
+import random
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Callable, List, Optional
+
+import numpy as np
+
+import bench
+import generator
+
+EXAMPLE_DIR = Path(__file__).resolve().parent / "Example"
+
+# Default tolerance for coordinate comparisons, in metres
+DEFAULT_TOLERANCE_M = 1e-3
+
+# Metres per degree of latitude (spherical approximation, fine for tolerances)
+_M_PER_DEG = 111_320.0
+
+
+# Default sides, as "module:function"
+DEFAULT_REFERENCE_FN = "reference_generator:generate_rows_geojson"
+DEFAULT_CANDIDATE_FN = "generator:generate_rows_geojson"
+
+
+def load_function(spec: str) -> Callable:
+    """Resolve "module:function"."""
+    module_name, _, attr = spec.partition(":")
+    return getattr(importlib.import_module(module_name), attr)
+
+
+def example_corpus() -> List[dict]:
+    """Field specs for the example area against every example AB line, with and without the turn."""
+    specs = []
+    ab_sources = [("path", 0)]
+    combined = json.loads((EXAMPLE_DIR / "combined.geojson").read_text())
+    ab_sources += [("combined", i) for i, f in enumerate(combined["features"])
+                   if (f.get("geometry") or {}).get("type") == "LineString"]
+    for source, index in ab_sources:
+        for turn in (False, True):
+            specs.append({"name": f"example-{source}-{index}{'-turn' if turn else ''}",
+                          "example": [source, index], "turn": turn})
+    return specs
+
+
+def synthetic_corpus(count: int, seed: int = 0) -> List[dict]:
+    """`count` seeded synthetic field specs covering shape, size, angle and turn options."""
+    rng = random.Random(seed)
+    specs = []
+    for n in range(count):
+        spacing = rng.choice([2.0, 4.5, 6.0, 9.0])
+        field = {
+            "shape": rng.choice(["ellipse", "ellipse", "rect", "notched"]),
+            "vertices": rng.choice([4, 8, 32, 128, 512]),
+            "holes": rng.choice([0, 0, 0, 1, 3, 8]),
+            "concavity": rng.choice([0.0, 0.0, 0.2, 0.5]),
+            "width_rows": rng.randint(3, 300),
+            "ab_angle_deg": rng.uniform(0.0, 360.0),
+            "aspect": rng.uniform(0.2, 2.0),
+            "spacing_m": spacing,
+        }
+        kwargs = {
+            "spacing_m": spacing,
+            "dest_side": rng.choice(["A", "B"]),
+            "dual_zone": rng.random() < 0.2,
+            "start_num": rng.randint(0, 20),
+        }
+        turn_vertices = rng.choice([0, 0, 2, 8, 32])
+        if turn_vertices:
+            kwargs.update(
+                attach_turns_both_ends=True,
+                flip_start_horizontal=rng.random() < 0.3,
+                flip_end_vertical=rng.random() < 0.3,
+                rotation_offset_a=rng.choice([0.0, 15.0, -90.0]),
+                rotation_offset_b=rng.choice([0.0, 45.0]),
+                turn_side_b=rng.choice(["B", "None"]),
+            )
+        specs.append({"name": f"synthetic-{seed}-{n:05d}", "field": field, "kwargs": kwargs,
+                      "turn_vertices": turn_vertices})
+    return specs
+
+
+def build_field(spec: dict):
+    """Return (area, ab, kwargs) for a corpus spec."""
+    kwargs = dict(spec.get("kwargs", {}))
+    if "example" in spec:
+        source, index = spec["example"]
+        area = json.loads((EXAMPLE_DIR / "shape.geojson").read_text())["features"][0]
+        ab = json.loads((EXAMPLE_DIR / f"{source}.geojson").read_text())["features"][index]
+        if spec.get("turn"):
+            kwargs["custom_turn_geojson"] = json.loads((EXAMPLE_DIR / "turn.geojson").read_text())
+        return area, ab, kwargs
+    area, ab = bench.synthetic_field(**spec["field"])
+    if spec.get("turn_vertices"):
+        kwargs["custom_turn_geojson"] = bench.synthetic_turn(spec["turn_vertices"])
+    return area, ab, kwargs
+
+
+def _distance_m(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """Approximate metre distance between (n, 2) lon/lat arrays."""
+    scale_x = _M_PER_DEG * np.cos(np.radians((a[:, 1] + b[:, 1]) / 2))
+    return np.hypot((a[:, 0] - b[:, 0]) * scale_x, (a[:, 1] - b[:, 1]) * _M_PER_DEG)
+
+
+def _coords(feature: dict) -> np.ndarray:
+    return np.asarray(feature["geometry"]["coordinates"], dtype=float).reshape(-1, 2)
+
+
+def compare_outputs(reference, candidate, tolerance_m: float = DEFAULT_TOLERANCE_M) -> dict:
+    """
+    Compare two (FeatureCollection, FeatureRoles) results. Returns the divergences
+    (human-readable strings) and the largest endpoint / turn deviations in metres.
+    """
+    divergences = []
+    result = {"divergences": divergences, "max_endpoint_m": 0.0, "max_destination_m": 0.0, "max_turn_m": 0.0}
+    (ref_fc, ref_roles), (cand_fc, cand_roles) = reference, candidate
+
+    def by_role(fc, roles, *names):
+        features = fc["features"]
+        return [features[i] for i in roles.select(*names)]
+
+    # rows: count, row indices and endpoints
+    ref_rows = by_role(ref_fc, ref_roles, generator.ROLE_ROW)
+    cand_rows = by_role(cand_fc, cand_roles, generator.ROLE_ROW)
+    if len(ref_rows) != len(cand_rows):
+        divergences.append(f"row count {len(ref_rows)} != {len(cand_rows)}")
+    else:
+        ref_index = ref_roles.row_index[ref_roles.select(generator.ROLE_ROW)]
+        cand_index = cand_roles.row_index[cand_roles.select(generator.ROLE_ROW)]
+        if not np.array_equal(ref_index, cand_index):
+            first = int(np.flatnonzero(ref_index != cand_index)[0])
+            divergences.append(f"row index differs from row {first}: {ref_index[first]} != {cand_index[first]}")
+        if ref_rows:
+            ref_ends = np.array([_coords(f)[[0, -1]] for f in ref_rows]).reshape(-1, 2)
+            cand_ends = np.array([_coords(f)[[0, -1]] for f in cand_rows]).reshape(-1, 2)
+            distances = _distance_m(ref_ends, cand_ends)
+            result["max_endpoint_m"] = float(distances.max())
+            if result["max_endpoint_m"] > tolerance_m:
+                worst = int(distances.argmax()) // 2
+                divergences.append(f"row {worst} endpoint off by {result['max_endpoint_m']:.6g} m")
+
+    # destinations: labels and positions
+    ref_dests = by_role(ref_fc, ref_roles, generator.ROLE_DESTINATION)
+    cand_dests = by_role(cand_fc, cand_roles, generator.ROLE_DESTINATION)
+    ref_labels = [f["properties"].get("name") for f in ref_dests]
+    cand_labels = [f["properties"].get("name") for f in cand_dests]
+    if ref_labels != cand_labels:
+        mismatch = next((i for i, (a, b) in enumerate(zip(ref_labels, cand_labels)) if a != b),
+                        min(len(ref_labels), len(cand_labels)))
+        divergences.append(f"labels differ at destination {mismatch} "
+                           f"({len(ref_labels)} vs {len(cand_labels)} labels)")
+    elif ref_dests:
+        distances = _distance_m(np.array([_coords(f)[0] for f in ref_dests]),
+                                np.array([_coords(f)[0] for f in cand_dests]))
+        result["max_destination_m"] = float(distances.max())
+        if result["max_destination_m"] > tolerance_m:
+            divergences.append(f"destination {int(distances.argmax())} off by "
+                               f"{result['max_destination_m']:.6g} m")
+
+    # turns: per-end counts and vertex-by-vertex geometry
+    for role in (generator.ROLE_TURN_A, generator.ROLE_TURN_B):
+        ref_turns = by_role(ref_fc, ref_roles, role)
+        cand_turns = by_role(cand_fc, cand_roles, role)
+        if len(ref_turns) != len(cand_turns):
+            divergences.append(f"{role} count {len(ref_turns)} != {len(cand_turns)}")
+            continue
+        role_max = 0.0
+        for i, (a, b) in enumerate(zip(ref_turns, cand_turns)):
+            ca, cb = _coords(a), _coords(b)
+            if a["geometry"]["type"] != b["geometry"]["type"] or ca.shape != cb.shape:
+                divergences.append(f"{role} {i} geometry structure differs")
+                break
+            if len(ca):
+                role_max = max(role_max, float(_distance_m(ca, cb).max()))
+        result["max_turn_m"] = max(result["max_turn_m"], role_max)
+        if role_max > tolerance_m:
+            divergences.append(f"{role} off by up to {role_max:.6g} m")
+    return result
+
+
+def _run(fn: Callable, area: dict, ab: dict, kwargs: dict):
+    started = time.perf_counter()
+    try:
+        return fn(area, ab, return_roles=True, **kwargs), None, time.perf_counter() - started
+    except Exception as e:
+        return None, f"{type(e).__name__}: {e}", time.perf_counter() - started
+
+
+def check_field(spec: dict, reference: dict, candidate: dict, tolerance_m: float = DEFAULT_TOLERANCE_M,
+                reference_fn: str = DEFAULT_REFERENCE_FN, candidate_fn: str = DEFAULT_CANDIDATE_FN) -> dict:
+    """Run both sides on one corpus field and compare them; returns a report entry (never raises)."""
+    entry = {"field": spec["name"], "ok": False, "divergences": []}
+    try:
+        area, ab, kwargs = build_field(spec)
+    except Exception as e:
+        entry["divergences"].append(f"could not build field: {type(e).__name__}: {e}")
+        return entry
+    ref, ref_error, entry["reference_s"] = _run(load_function(reference_fn), area, ab, {**kwargs, **reference})
+    cand, cand_error, entry["candidate_s"] = _run(load_function(candidate_fn), area, ab, {**kwargs, **candidate})
+
+    if ref_error or cand_error:
+        # failing the same way on both sides is equivalent behaviour
+        if ref_error and cand_error and ref_error.split(":")[0] == cand_error.split(":")[0]:
+            entry["ok"] = True
+            entry["note"] = f"both failed: {ref_error}"
+        else:
+            entry["divergences"].append(f"reference error: {ref_error}; candidate error: {cand_error}")
+        return entry
+
+    entry.update(compare_outputs(ref, cand, tolerance_m))
+    entry["rows"] = int(len(ref[1].select(generator.ROLE_ROW)))
+    entry["ok"] = not entry["divergences"]
+    return entry
+
+
+def run_harness(specs: List[dict], reference: dict, candidate: dict, tolerance_m: float = DEFAULT_TOLERANCE_M,
+                workers: Optional[int] = None, reference_fn: str = DEFAULT_REFERENCE_FN,
+                candidate_fn: str = DEFAULT_CANDIDATE_FN) -> dict:
+    """Check every spec across a process pool and return the report."""
+    workers = workers or os.cpu_count() or 1
+    started = time.perf_counter()
+    args = [(spec, reference, candidate, tolerance_m, reference_fn, candidate_fn) for spec in specs]
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            entries = list(pool.map(check_field, *zip(*args), chunksize=max(1, len(args) // (workers * 8))))
+    else:
+        entries = [check_field(*a) for a in args]
+
+    failed = [e for e in entries if not e["ok"]]
+    ref_s = sum(e.get("reference_s", 0.0) for e in entries)
+    cand_s = sum(e.get("candidate_s", 0.0) for e in entries)
+    return {
+        "reference": {"function": reference_fn, "kwargs": reference},
+        "candidate": {"function": candidate_fn, "kwargs": candidate},
+        "tolerance_m": tolerance_m,
+        "fields": len(entries),
+        "diverged": len(failed),
+        "reference_s": round(ref_s, 4),
+        "candidate_s": round(cand_s, 4),
+        "speedup": round(ref_s / cand_s, 3) if cand_s else None,
+        "wall_s": round(time.perf_counter() - started, 4),
+        "entries": entries,
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Check a candidate generation path against the reference.")
+    parser.add_argument("--reference", default="{}", help="JSON kwargs for the reference side")
+    parser.add_argument("--candidate", default="{}", help="JSON kwargs for the candidate side")
+    parser.add_argument("--reference-fn", default=DEFAULT_REFERENCE_FN,
+                        help=f"module:function for the reference (default: {DEFAULT_REFERENCE_FN})")
+    parser.add_argument("--candidate-fn", default=DEFAULT_CANDIDATE_FN,
+                        help=f"module:function for the candidate (default: {DEFAULT_CANDIDATE_FN})")
+    parser.add_argument("--fields", type=int, default=200, help="number of synthetic fields")
+    parser.add_argument("--seed", type=int, default=0, help="synthetic corpus seed")
+    parser.add_argument("--no-examples", action="store_true", help="skip the example fields")
+    parser.add_argument("--tolerance-m", type=float, default=DEFAULT_TOLERANCE_M,
+                        help=f"coordinate tolerance in metres (default: {DEFAULT_TOLERANCE_M})")
+    parser.add_argument("--workers", type=int, help="worker processes (default: CPU count)")
+    parser.add_argument("-o", "--output", default="-", help="JSON report (default: stdout)")
+    parser.add_argument("--all", action="store_true", help="report every field, not only divergences")
+    args = parser.parse_args(argv)
+
+    specs = [] if args.no_examples else example_corpus()
+    specs += synthetic_corpus(args.fields, args.seed)
+    report = run_harness(specs, json.loads(args.reference), json.loads(args.candidate), args.tolerance_m,
+                         args.workers, args.reference_fn, args.candidate_fn)
+    if not args.all:
+        report["entries"] = [e for e in report["entries"] if not e["ok"]]
+
+    text = json.dumps(report, indent=2)
+    if args.output == "-":
+        print(text)
+    else:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    print(f"{report['fields'] - report['diverged']}/{report['fields']} fields equivalent "
+          f"(candidate speedup {report['speedup']}x)", file=sys.stderr)
+    return 1 if report["diverged"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,41 +1,136 @@
+import contextlib
+import datetime
+import hashlib
+import itertools
 import json
 import math
-from typing import Optional, List, Tuple
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+from typing import TYPE_CHECKING, NamedTuple, Optional, List, Tuple
 from shapely.geometry import shape, mapping, LineString, Point, Polygon, GeometryCollection
-from shapely.ops import transform, snap, split
-from shapely.affinity import rotate, translate
-import pyproj
+from shapely.ops import snap, split
+from shapely.affinity import rotate
+import numpy as np
+import shapely
 import uuid
 
+# pyproj (and its CRS database) is only loaded by the first projection, so imports
+# that never project (cache hits, key computation, the app before any input) skip it
+if TYPE_CHECKING:
+    import pyproj
+
+import profiling
+
 # Global tolerance for geometric operations (in meters for projected CRS)
 SNAP_TOLERANCE = 0.01  # 1cm tolerance for snapping operations
 
+# Process-wide registry of pyproj transformers keyed by (source CRS, target CRS).
+# Building a Transformer is far more expensive than using one, so every projection
+# call shares this bounded LRU cache instead of constructing a new one.
+TRANSFORMER_CACHE_SIZE = 32
+_transformer_cache: "OrderedDict[Tuple[str, str], pyproj.Transformer]" = OrderedDict()
+_transformer_lock = threading.Lock()
+
+# Max projected turn templates kept (keyed by template JSON and UTM zone)
+TEMPLATE_CACHE_SIZE = 64
+_template_cache: "OrderedDict[Tuple[str, str], tuple]" = OrderedDict()
+_template_lock = threading.Lock()
+
+# Available row clipping engines (see generate_rows_geojson's clip_method)
+CLIP_METHODS = ("geos", "scanline", "vectorized")
+
+# Rows materialized per batch by iter_row_features
+STREAM_CHUNK_ROWS = 256
+
+# Feature ID modes (see generate_rows' id_mode)
+ID_MODES = ("uuid4", "content")
+# Parameters that do not change the generated features, left out of content IDs
+_OUTPUT_NEUTRAL_PARAMS = ("clip_method", "id_mode")
 
-def _get_utm_crs(lon, lat):
+# Feature roles within a generated network
+ROLE_ROW = "row"
+ROLE_TURN_A = "turn_a"
+ROLE_TURN_B = "turn_b"
+ROLE_DESTINATION = "destination"
+_ROLE_CODES = {ROLE_ROW: 1, ROLE_TURN_A: 2, ROLE_TURN_B: 3, ROLE_DESTINATION: 4}
+
+
+def get_utm_crs(lon, lat):
     """Get the appropriate UTM CRS for a given lon/lat coordinate."""
     utm_zone = int((lon + 180) / 6) + 1
     hemisphere = 'north' if lat >= 0 else 'south'
     return f"EPSG:{32600 + utm_zone if hemisphere == 'north' else 32700 + utm_zone}"
 
 
-def _to_utm(geom, lon, lat):
-    """Project geometry from WGS84 to appropriate UTM zone for accurate metric calculations."""
-    utm_crs = _get_utm_crs(lon, lat)
-    project = pyproj.Transformer.from_crs("EPSG:4326", utm_crs, always_xy=True).transform
-    return transform(project, geom)
+def get_transformer(src_crs: str, dst_crs: str) -> "pyproj.Transformer":
+    """
+    Return a shared (always_xy) transformer from src_crs to dst_crs.
+    Transformers are built on first use and kept in a thread-safe LRU registry;
+    the least recently used entry is evicted once TRANSFORMER_CACHE_SIZE is exceeded.
+    """
+    key = (src_crs, dst_crs)
+    with _transformer_lock:
+        transformer = _transformer_cache.get(key)
+        if transformer is not None:
+            _transformer_cache.move_to_end(key)
+            return transformer
+        import pyproj
+        transformer = pyproj.Transformer.from_crs(src_crs, dst_crs, always_xy=True)
+        _transformer_cache[key] = transformer
+        while len(_transformer_cache) > TRANSFORMER_CACHE_SIZE:
+            _transformer_cache.popitem(last=False)
+        return transformer
+
+
+def clear_transformer_cache():
+    """Drop every cached transformer and projected turn template (e.g. after changing pyproj network settings)."""
+    with _transformer_lock:
+        _transformer_cache.clear()
+    with _template_lock:
+        _template_cache.clear()
 
 
-def _from_utm(geom, lon, lat):
-    """Project geometry from UTM back to WGS84."""
-    utm_crs = _get_utm_crs(lon, lat)
-    project = pyproj.Transformer.from_crs(utm_crs, "EPSG:4326", always_xy=True).transform
-    return transform(project, geom)
+def project(geom, transformer: "pyproj.Transformer"):
+    """Apply `transformer` to all coordinates of `geom` in one vectorized call."""
+    def _apply(coords):
+        x, y = transformer.transform(coords[:, 0], coords[:, 1])
+        return np.column_stack([x, y])
+    return shapely.transform(geom, _apply)
+
+
+def to_utm(geom, lon, lat):
+    """
+    Project geometry (or an array of geometries) from WGS84 to the UTM zone of
+    (lon, lat) for accurate metric calculations.
+    """
+    utm_crs = get_utm_crs(lon, lat)
+    return project(geom, get_transformer("EPSG:4326", utm_crs))
 
 
 def _rotate(geom, angle_deg, origin=(0, 0)):
     return rotate(geom, angle_deg, origin=origin, use_radians=False)
 
 
+def _rotated_to_wgs84(coords: np.ndarray, angle_deg, origin, lon, lat) -> np.ndarray:
+    """
+    Unrotate an (n, 2) array of metric coordinates about `origin` and project it from
+    UTM to WGS84 with a single vectorized transformer call.
+    """
+    to_wgs = get_transformer(get_utm_crs(lon, lat), "EPSG:4326")
+    cos_a = math.cos(math.radians(angle_deg))
+    sin_a = math.sin(math.radians(angle_deg))
+    ox, oy = origin
+    dx = coords[:, 0] - ox
+    dy = coords[:, 1] - oy
+    x = ox + dx * cos_a - dy * sin_a
+    y = oy + dx * sin_a + dy * cos_a
+    out_x, out_y = to_wgs.transform(x, y)
+    return np.column_stack([out_x, out_y])
+
+
 def _snap_point_to_line(point: Point, line: LineString, tolerance: float = SNAP_TOLERANCE) -> Point:
     """Snap a point to the nearest location on a line if within tolerance."""
     # Project point onto line
@@ -91,37 +186,191 @@ def _label_sequence(start_letter: str, start_num: int, index: int, zero_pad: boo
     return f"{letter}{num_s}"
 
 
-def _attach_custom_turn(template_geom, template_anchor, dest_point, angle_deg: float = 0.0,
-                        flip_horizontal: bool = False, flip_vertical: bool = False):
+def _clip_rows_geos(area_rot, row_ys, x_min, x_max):
+    """
+    Clip horizontal rows to `area_rot` with one GEOS intersection per row.
+    `row_ys` is a list of (row_index, y); returns a list of (row_index, LineString).
     """
-    Attach a custom-turn geometry template to a destination point, using a provided anchor point
-    from the template (both provided in the same metric CRS, EPSG:3857).
+    clipped_rows = []
+    for row_index, y_pos in row_ys:
+        line = LineString([(x_min, y_pos), (x_max, y_pos)])
 
-    Steps:
-    - Translate the template so that the template_anchor is at the origin.
-    - Apply horizontal/vertical flips if requested.
-    - Rotate the template around the origin by `angle_deg`.
-    - Translate the rotated template so its anchor sits at `dest_point`.
+        # Clip to polygon
+        intersection = line.intersection(area_rot)
+
+        if intersection.is_empty:
+            continue
+
+        # Handle different geometry types from intersection
+        if intersection.geom_type == 'LineString':
+            if intersection.length > SNAP_TOLERANCE:
+                clipped_rows.append((row_index, intersection))
+        elif intersection.geom_type == 'MultiLineString':
+            for segment in intersection.geoms:
+                if segment.length > SNAP_TOLERANCE:
+                    clipped_rows.append((row_index, segment))
+        elif intersection.geom_type == 'GeometryCollection':
+            for geom in intersection.geoms:
+                if geom.geom_type == 'LineString' and geom.length > SNAP_TOLERANCE:
+                    clipped_rows.append((row_index, geom))
+    return clipped_rows
 
-    This ignores the template's original world location and uses its shape + provided anchor.
+
+def _clip_rows_vectorized(area_rot, row_ys, x_min, x_max):
     """
-    # center template around the anchor (so anchor moves to origin)
-    centered = translate(template_geom, xoff=-template_anchor.x, yoff=-template_anchor.y)
-    
-    # apply flips if requested (scale by -1 on the respective axis)
-    flipped = centered
-    if flip_horizontal:
-        from shapely.affinity import scale
-        flipped = scale(flipped, xfact=-1, yfact=1, origin=(0, 0))
-    if flip_vertical:
-        from shapely.affinity import scale
-        flipped = scale(flipped, xfact=1, yfact=-1, origin=(0, 0))
-    
-    # rotate around origin to align with row direction
-    rotated = rotate(flipped, angle_deg, origin=(0, 0), use_radians=False)
-    # translate so anchor (now at origin) is moved to dest_point coordinates
-    attached = translate(rotated, xoff=dest_point.x, yoff=dest_point.y)
-    return attached
+    Clip horizontal rows to `area_rot` with shapely 2 array operations.
+
+    All rows are built as one LineString array and intersected with the area in a
+    single call (GEOS runs without the GIL); MultiLineString and
+    GeometryCollection results are exploded with `get_parts`. Same contract as
+    `_clip_rows_geos`.
+    """
+    if not row_ys:
+        return []
+    row_index = np.array([i for i, _ in row_ys], dtype=np.int64)
+    ys = np.array([y for _, y in row_ys], dtype=float)
+
+    coords = np.empty((len(ys), 2, 2))
+    coords[:, 0, 0] = x_min
+    coords[:, 1, 0] = x_max
+    coords[:, :, 1] = ys[:, None]
+    lines = shapely.linestrings(coords)
+
+    # Rows that miss the area come back empty and yield no parts below
+    pieces = shapely.intersection(lines, area_rot)
+
+    # Explode multi-part results; keep LineString parts longer than the tolerance
+    parts, part_idx = shapely.get_parts(pieces, return_index=True)
+    keep = (shapely.get_type_id(parts) == shapely.GeometryType.LINESTRING) & (
+        shapely.length(parts) > SNAP_TOLERANCE
+    )
+    part_rows = row_index[part_idx[keep]]
+    return list(zip(part_rows.tolist(), parts[keep]))
+
+
+def _polygon_edges(geom) -> np.ndarray:
+    """Return every ring edge (exterior and holes) of a (Multi)Polygon as an (n, 4) x0, y0, x1, y1 array."""
+    if geom.geom_type == "Polygon":
+        polygons = [geom]
+    elif geom.geom_type == "MultiPolygon":
+        polygons = list(geom.geoms)
+    else:
+        raise ValueError(f"Scanline clipping needs a Polygon or MultiPolygon area, got {geom.geom_type}")
+
+    edges = []
+    for poly in polygons:
+        for ring in [poly.exterior, *poly.interiors]:
+            coords = np.asarray(ring.coords)[:, :2]
+            edges.append(np.hstack([coords[:-1], coords[1:]]))
+    if not edges:
+        return np.empty((0, 4))
+    return np.vstack(edges)
+
+
+def _clip_rows_scanline(area_rot, row_ys):
+    """
+    Clip horizontal rows to `area_rot` analytically with a scanline sweep.
+
+    The polygon edges are put into an active edge table once: with the row y-values
+    sorted, each non-horizontal edge is active for the contiguous run of rows with
+    y_min <= y < y_max (half-open, so shared vertices are counted once). All edge/row
+    crossings are then computed together, sorted by (row, x) and paired into
+    entry/exit intervals by the even-odd rule, which also handles holes.
+
+    The half-open rule misses boundary that lies on a row, so the (rare) rows that
+    pass exactly through polygon vertices are redone by `_cut_at_vertices`: horizontal
+    edges on the row are added to its intervals and the result is cut at each vertex,
+    matching the pieces a GEOS intersection returns.
+
+    Same contract as `_clip_rows_geos`: a list of (row_index, LineString) ordered by row.
+    """
+    if not row_ys:
+        return []
+    order = sorted(row_ys, key=lambda item: item[1])
+    row_index = np.array([i for i, _ in order], dtype=np.int64)
+    ys = np.array([y for _, y in order], dtype=float)
+
+    all_edges = _polygon_edges(area_rot)
+    horizontal = all_edges[:, 1] == all_edges[:, 3]
+    edges = all_edges[~horizontal]  # horizontal edges never cross a row
+    x0, y0, x1, y1 = edges.T
+    y_lo = np.minimum(y0, y1)
+    y_hi = np.maximum(y0, y1)
+
+    # Active edge table: edge e is active for sorted rows first[e] .. stop[e] - 1
+    first = np.searchsorted(ys, y_lo, side="left")
+    stop = np.searchsorted(ys, y_hi, side="left")
+    counts = stop - first
+    total = int(counts.sum())
+
+    # Expand to one entry per (edge, row) crossing and intersect
+    edge_ids = np.repeat(np.arange(len(edges)), counts)
+    starts = np.repeat(np.cumsum(counts) - counts, counts)
+    rows = np.repeat(first, counts) + (np.arange(total) - starts)
+    cross_y = ys[rows]
+    cross_x = x0[edge_ids] + (cross_y - y0[edge_ids]) * (
+        (x1[edge_ids] - x0[edge_ids]) / (y1[edge_ids] - y0[edge_ids])
+    )
+
+    # Sort crossings by row then x; consecutive pairs are entry/exit intervals
+    sort_idx = np.lexsort((cross_x, rows))
+    rows = rows[sort_idx].reshape(-1, 2)
+    cross_x = cross_x[sort_idx].reshape(-1, 2)
+    if np.any(rows[:, 0] != rows[:, 1]):
+        raise ValueError("Scanline clipping found an odd crossing count; is the area polygon closed and valid?")
+    positions, x_starts, x_ends = rows[:, 0], cross_x[:, 0], cross_x[:, 1]
+
+    # Rows through polygon vertices: add the horizontal edges lying on them and cut
+    # the merged intervals at those vertices
+    vertex_pos = np.minimum(np.searchsorted(ys, all_edges[:, 1]), len(ys) - 1)
+    on_row = ys[vertex_pos] == all_edges[:, 1]
+    touched = np.unique(vertex_pos[on_row])
+    if len(touched):
+        untouched = ~np.isin(positions, touched)
+        redone = [(positions[untouched], x_starts[untouched], x_ends[untouched])]
+        for pos in touched.tolist():
+            spans = list(zip(x_starts[positions == pos].tolist(), x_ends[positions == pos].tolist()))
+            row_edges = all_edges[horizontal & (all_edges[:, 1] == ys[pos])]
+            spans += zip(np.minimum(row_edges[:, 0], row_edges[:, 2]).tolist(),
+                         np.maximum(row_edges[:, 0], row_edges[:, 2]).tolist())
+            pieces = np.array(_cut_at_vertices(spans, all_edges[on_row & (vertex_pos == pos), 0]), dtype=float)
+            pieces = pieces.reshape(-1, 2)
+            redone.append((np.full(len(pieces), pos), pieces[:, 0], pieces[:, 1]))
+        positions, x_starts, x_ends = (np.concatenate(parts) for parts in zip(*redone))
+        sort_idx = np.lexsort((x_starts, positions))
+        positions, x_starts, x_ends = positions[sort_idx], x_starts[sort_idx], x_ends[sort_idx]
+
+    keep = (x_ends - x_starts) > SNAP_TOLERANCE
+    clipped_rows = []
+    for pos, x_start, x_end in zip(positions[keep], x_starts[keep], x_ends[keep]):
+        y_pos = ys[pos]
+        clipped_rows.append((int(row_index[pos]), LineString([(x_start, y_pos), (x_end, y_pos)])))
+    return clipped_rows
+
+
+def _cut_at_vertices(spans, cuts):
+    """
+    Merge one row's (x_start, x_end) `spans` and cut them at the vertex x-values
+    `cuts`, the way GEOS nodes a line that runs through polygon vertices.
+    """
+    cuts = np.unique(cuts)
+    pieces = []
+    for x_start, x_end in _merge_spans(spans):
+        inner = cuts[(cuts > x_start) & (cuts < x_end)].tolist()
+        bounds = [x_start, *inner, x_end]
+        pieces.extend(zip(bounds[:-1], bounds[1:]))
+    return pieces
+
+
+def _merge_spans(spans):
+    """Union of (start, end) spans as a sorted list of disjoint spans; touching spans join."""
+    merged = []
+    for x_start, x_end in sorted(spans):
+        if merged and x_start <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], x_end)
+        else:
+            merged.append([x_start, x_end])
+    return merged
 
 
 def _find_user_line_in_clipped(user_line_m_rot, clipped_lines, tolerance=1.0):
@@ -138,43 +387,272 @@ def _find_user_line_in_clipped(user_line_m_rot, clipped_lines, tolerance=1.0):
     return None
 
 
-def generate_rows_geojson(
-    area_feature: dict,
-    ab_feature: dict,
-    spacing_m: float = 6.0,
-    start_letter: str = "F",
-    start_num: int = 1,
-    zero_pad: bool = True,
-    dual_zone: bool = False,
-    dest_side: str = "A",
-    custom_turn_geojson: Optional[dict] = None,
-    keep_start_letter: bool = True,
-    attach_turns_both_ends: bool = False,
-    flip_start_horizontal: bool = False,
-    flip_start_vertical: bool = False,
-    flip_end_horizontal: bool = False,
-    flip_end_vertical: bool = False,
-    secondary_turn_geojson: Optional[dict] = None,
-    turn_side_a: str = "A",
-    turn_side_b: str = "B",
-    rotation_offset_a: float = 0.0,
-    rotation_offset_b: float = 0.0,
-) -> dict:
+def _new_ids(count: int) -> np.ndarray:
+    """Return `count` fresh uuid4 feature IDs as an object array."""
+    return np.array([str(uuid.uuid4()) for _ in range(count)], dtype=object)
+
+
+def _mix64(x: np.ndarray) -> np.ndarray:
+    """splitmix64 finalizer over a uint64 array (a bijection with good avalanche)."""
+    x = (x ^ (x >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+    x = (x ^ (x >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    return x ^ (x >> np.uint64(31))
+
+
+def _content_ids(id_key: bytes, row_index: np.ndarray, ordinals: np.ndarray, role: str) -> np.ndarray:
     """
-    Generate row paths with consistent spatial reference handling.
-    
-    All geometric operations are performed in EPSG:3857 (Web Mercator) for accurate
-    metric-based spacing calculations. Results are transformed back to WGS84 for output.
-    
-    Args:
-        area_feature: GeoJSON Feature (Polygon) in WGS84
-        ab_feature: GeoJSON Feature (LineString) in WGS84 defining reference line A->B
-        spacing_m: Row spacing in meters (applied in projected space)
-        ... (other parameters as before)
-    
-    Returns:
-        FeatureCollection with NetworkPath and NetworkDestination features in WGS84
+    Derive deterministic UUID-formatted feature IDs from a generation key.
+
+    Each (row index, segment ordinal, role) triple is packed into one 64-bit word and
+    mixed with the two halves of `id_key` across all rows at once; the same inputs
+    always give the same IDs and distinct triples never collide within a field.
+    """
+    k0 = np.frombuffer(id_key[:8], dtype="<u8")[0]
+    k1 = np.frombuffer(id_key[8:16], dtype="<u8")[0]
+    packed = (
+        (row_index.astype(np.int64).astype(np.uint64) & np.uint64(0xFFFFFFFF))
+        | (ordinals.astype(np.uint64) << np.uint64(32))
+        | (np.uint64(_ROLE_CODES[role]) << np.uint64(56))
+    )
+    hi = _mix64(packed ^ k1)
+    lo = _mix64(packed ^ k0)
+    # Mark as an RFC 9562 version 8 (custom) UUID
+    hi = (hi & ~np.uint64(0xF000)) | np.uint64(0x8000)
+    lo = (lo & np.uint64(0x3FFFFFFFFFFFFFFF)) | np.uint64(0x8000000000000000)
+    ids = []
+    for h, l in zip(hi.tolist(), lo.tolist()):
+        hex_id = f"{h:016x}{l:016x}"
+        ids.append(f"{hex_id[:8]}-{hex_id[8:12]}-{hex_id[12:16]}-{hex_id[16:20]}-{hex_id[20:]}")
+    return np.array(ids, dtype=object)
+
+
+def _canonical_json(obj) -> str:
+    return json.dumps(obj, sort_keys=True, separators=(",", ":"), default=str)
+
+
+def _path_properties(timestamp: str) -> dict:
+    return {
+        "type": "NetworkPath",
+        "createDate": timestamp,
+        "updateDate": timestamp,
+        "version": 1,
+        "direction": "two_way",
+        "speedLimit": "1.2",
+        "enabled": True
+    }
+
+
+def _destination_properties(timestamp: str, name: str) -> dict:
+    return {
+        "type": "NetworkDestination",
+        "groupMpath": "",
+        "createDate": timestamp,
+        "updateDate": timestamp,
+        "version": 1,
+        "name": name,
+        "groupId": ""
+    }
+
+
+class GenerationStats:
+    """
+    Optional instrumentation for generation runs: pass one as `stats=` to
+    `generate_rows`, `generate_rows_geojson`, `prepare_geometry`, `build_rows` or
+    `iter_row_features` and read it afterwards. Runs sharing one object accumulate.
+
+    `stages` holds wall seconds per stage (project, clip, backproject, labels, turns,
+    features). Counters: `rows` (distinct row lines), `segments` (clipped row paths),
+    `turns`, `geos_calls` (intersection calls the clipper made into GEOS: one per row
+    for "geos", one array call for "vectorized", none for "scanline") and `bytes`
+    (size of the output coordinate arrays).
+    """
+    __slots__ = ("stages", "rows", "segments", "turns", "geos_calls", "bytes")
+
+    def __init__(self):
+        self.stages = {}
+        self.rows = 0
+        self.segments = 0
+        self.turns = 0
+        self.geos_calls = 0
+        self.bytes = 0
+
+    @contextlib.contextmanager
+    def stage(self, name: str):
+        started = time.perf_counter()
+        try:
+            yield self
+        finally:
+            self.stages[name] = self.stages.get(name, 0.0) + time.perf_counter() - started
+
+    def as_dict(self) -> dict:
+        return {"stages": dict(self.stages), "rows": self.rows, "segments": self.segments,
+                "turns": self.turns, "geos_calls": self.geos_calls, "bytes": self.bytes}
+
+
+# Shared no-op stage for runs without stats (nullcontext is reusable)
+_NO_STAGE = contextlib.nullcontext()
+
+
+def _stage(stats: Optional[GenerationStats], name: str):
+    return _NO_STAGE if stats is None else stats.stage(name)
+
+
+class TurnBlock:
+    """
+    Turns attached at one row end: a (rows, k, 2) WGS84 coordinate block (one turn per
+    row) plus IDs, sharing the coordinate structure of the template they came from.
+    """
+    __slots__ = ("coords", "ids", "template", "role")
+
+    def __init__(self, coords: np.ndarray, ids: np.ndarray, template, role: str = ROLE_TURN_A):
+        self.coords = coords
+        self.ids = ids
+        self.template = template
+        self.role = role
+
+    def geometry(self, i: int) -> dict:
+        """GeoJSON geometry of the turn attached to row position `i`."""
+        block = self.coords[i]
+        if self.template.geom_type == "LineString":
+            return {"type": "LineString", "coordinates": block.tolist()}
+        if self.template.geom_type == "Point":
+            return {"type": "Point", "coordinates": block[0].tolist()}
+        return mapping(shapely.transform(self.template, lambda _: block))
+
+
+class FeatureRoles(NamedTuple):
+    """
+    Side-table aligned with a RowSet's feature order: the role (ROLE_*) and row index
+    of every feature, so callers can split the output without inspecting geometries.
+    """
+    role: np.ndarray
+    row_index: np.ndarray
+
+    def select(self, *roles: str) -> np.ndarray:
+        """Positions of the features with any of `roles`."""
+        return np.flatnonzero(np.isin(self.role, roles))
+
+
+class RowSet:
     """
+    Columnar result of `generate_rows`.
+
+    Rows are stored as one concatenated WGS84 coordinate array with per-row offsets,
+    alongside arrays of row indices, destination names, destination coordinates and
+    feature IDs. GeoJSON Feature dicts are only built by iteration or `.to_geojson()`,
+    in the same order as before: each row path followed by its turns, then all
+    destinations.
+    """
+    __slots__ = ("row_index", "labels", "row_coords", "row_offsets", "dest_coords",
+                 "path_ids", "dest_ids", "turns", "timestamp")
+
+    def __init__(self, row_index, labels, row_coords, row_offsets, dest_coords,
+                 path_ids, dest_ids, turns, timestamp):
+        self.row_index = row_index
+        self.labels = labels
+        self.row_coords = row_coords
+        self.row_offsets = row_offsets
+        self.dest_coords = dest_coords
+        self.path_ids = path_ids
+        self.dest_ids = dest_ids
+        self.turns = turns
+        self.timestamp = timestamp
+
+    @property
+    def row_count(self) -> int:
+        return len(self.row_index)
+
+    def __len__(self):
+        """Number of features (rows, turns and destinations)."""
+        return self.row_count * (2 + len(self.turns))
+
+    def __iter__(self):
+        return self.iter_features()
+
+    def row_geometry(self, i: int) -> dict:
+        """GeoJSON geometry of the row at position `i`."""
+        start, end = self.row_offsets[i], self.row_offsets[i + 1]
+        return {"type": "LineString", "coordinates": self.row_coords[start:end].tolist()}
+
+    def iter_features(self, by_row: bool = False):
+        """
+        Yield GeoJSON Feature dicts: each row path and its turns, then all destinations.
+        With `by_row` each row's destination follows directly after its path and turns.
+        """
+        for i in range(self.row_count):
+            yield {
+                "type": "Feature",
+                "id": self.path_ids[i],
+                "properties": _path_properties(self.timestamp),
+                "geometry": self.row_geometry(i),
+            }
+            for turn in self.turns:
+                yield {
+                    "type": "Feature",
+                    "id": turn.ids[i],
+                    "properties": _path_properties(self.timestamp),
+                    "geometry": turn.geometry(i),
+                }
+            if by_row:
+                yield self._destination_feature(i)
+        if not by_row:
+            for i in range(self.row_count):
+                yield self._destination_feature(i)
+
+    def feature_roles(self, by_row: bool = False) -> FeatureRoles:
+        """Role and row index of each feature, in `iter_features(by_row)` order."""
+        n = self.row_count
+        per_row = [ROLE_ROW] + [turn.role for turn in self.turns]
+        if by_row:
+            per_row.append(ROLE_DESTINATION)
+        role = np.tile(np.array(per_row, dtype=object), n)
+        row_index = np.repeat(np.asarray(self.row_index, dtype=np.int64), len(per_row))
+        if not by_row:
+            role = np.concatenate([role, np.full(n, ROLE_DESTINATION, dtype=object)])
+            row_index = np.concatenate([row_index, np.asarray(self.row_index, dtype=np.int64)])
+        return FeatureRoles(role, row_index)
+
+    def _destination_feature(self, i: int) -> dict:
+        return {
+            "type": "Feature",
+            "id": self.dest_ids[i],
+            "properties": _destination_properties(self.timestamp, self.labels[i]),
+            "geometry": {"type": "Point", "coordinates": self.dest_coords[i].tolist()},
+        }
+
+    def to_geojson(self) -> dict:
+        """Materialize the full FeatureCollection."""
+        return {
+            "type": "FeatureCollection",
+            "features": list(self.iter_features()),
+        }
+
+
+class FieldGeometry:
+    """
+    Geometry stage of row generation, reusable across labeling, destination and turn
+    settings (see `prepare_geometry` and `build_rows`).
+
+    Holds the field projected to UTM and rotated so AB lies on the x axis, and, once
+    clipped for a spacing by `_clip_field`, the WGS84 coordinates of the clipped rows
+    (`row_coords_wgs` split by `row_offsets`, oriented like AB), per-row endpoint data
+    in metric space and the total row length `row_length_m`.
+    """
+    __slots__ = ("area_feature", "ab_feature", "spacing_m", "clip_method",
+                 "center_lon", "center_lat", "angle_deg", "rotation_origin", "ab_dx",
+                 "a_rot", "area_rot", "ab_rot", "reference_y", "row_length_m", "segment_ordinals",
+                 "row_index", "row_offsets", "row_coords_wgs", "first_pts", "last_pts",
+                 "start_nearer_a", "start_farther_a", "cos_r", "sin_r")
+
+    def copy(self) -> "FieldGeometry":
+        frame = FieldGeometry()
+        for name in self.__slots__:
+            setattr(frame, name, getattr(self, name, None))
+        return frame
+
+
+def _project_field(area_feature: dict, ab_feature: dict) -> FieldGeometry:
+    """Project the area and AB line to UTM and rotate AB onto the x axis."""
     # Parse input geometries (assumed to be in WGS84)
     area_geom = shape(area_feature["geometry"])
     ab_geom = shape(ab_feature["geometry"])
@@ -184,8 +662,8 @@ def generate_rows_geojson(
     center_lon, center_lat = centroid.x, centroid.y
 
     # PROJECT TO METRIC CRS (UTM) for accurate metric-based operations
-    area_m = _to_utm(area_geom, center_lon, center_lat)
-    ab_m = _to_utm(ab_geom, center_lon, center_lat)
+    area_m = to_utm(area_geom, center_lon, center_lat)
+    ab_m = to_utm(ab_geom, center_lon, center_lat)
 
     # Extract A and B endpoints in metric space
     ax, ay = ab_m.coords[0]
@@ -205,7 +683,28 @@ def generate_rows_geojson(
     ab_rot_coords = list(ab_rot.coords)
     # Use average of both endpoints to handle any floating-point imprecision in rotation
     reference_y = (ab_rot_coords[0][1] + ab_rot_coords[-1][1]) / 2.0
-    
+
+    frame = FieldGeometry()
+    frame.area_feature = area_feature
+    frame.ab_feature = ab_feature
+    frame.center_lon = center_lon
+    frame.center_lat = center_lat
+    frame.angle_deg = angle_deg
+    frame.rotation_origin = rotation_origin
+    frame.ab_dx = bx - ax
+    frame.a_rot = Point(ab_rot_coords[0])
+    frame.area_rot = area_rot
+    frame.ab_rot = ab_rot
+    frame.reference_y = reference_y
+    return frame
+
+
+def _clip_field(base: FieldGeometry, spacing_m: float, clip_method: str,
+                stats: Optional[GenerationStats] = None) -> FieldGeometry:
+    """Return a copy of `base` with its rows at `spacing_m` clipped to the area."""
+    area_rot = base.area_rot
+    reference_y = base.reference_y
+
     # Get polygon bounds for generating parallel lines
     minx, miny, maxx, maxy = area_rot.bounds
     pad = (maxx - minx) * 2.0  # Horizontal padding for full-width lines
@@ -214,285 +713,712 @@ def generate_rows_geojson(
     rows_below = int(math.ceil((reference_y - miny) / spacing_m)) + 2
     rows_above = int(math.ceil((maxy - reference_y) / spacing_m)) + 2
     
-    # Generate parallel lines at EXACT spacing intervals from reference_y
-    row_lines_with_index = []
-    for i in range(-rows_below, rows_above + 1):
-        y_pos = reference_y + (i * spacing_m)  # Exact metric spacing
-        line = LineString([(minx - pad, y_pos), (maxx + pad, y_pos)])
-        row_lines_with_index.append((i, line))
-    
-    # Clip lines to polygon boundary and maintain row index
-    clipped_rows = []
-    
-    for row_index, line in row_lines_with_index:
-        # Special handling for row 0: use the actual AB line
-        if row_index == 0:
-            clipped_rows.append((row_index, ab_rot))
-            continue
-        
-        # Clip to polygon
-        intersection = line.intersection(area_rot)
-        
-        if intersection.is_empty:
-            continue
-        
-        # Handle different geometry types from intersection
-        if intersection.geom_type == 'LineString':
-            if intersection.length > SNAP_TOLERANCE:
-                clipped_rows.append((row_index, intersection))
-        elif intersection.geom_type == 'MultiLineString':
-            for segment in intersection.geoms:
-                if segment.length > SNAP_TOLERANCE:
-                    clipped_rows.append((row_index, segment))
-        elif intersection.geom_type == 'GeometryCollection':
-            for geom in intersection.geoms:
-                if geom.geom_type == 'LineString' and geom.length > SNAP_TOLERANCE:
-                    clipped_rows.append((row_index, geom))
-    
+    # Generate parallel row positions at EXACT spacing intervals from reference_y.
+    # Row 0 is not clipped: the actual AB line is used for it below.
+    row_ys = [
+        (i, reference_y + (i * spacing_m))  # Exact metric spacing
+        for i in range(-rows_below, rows_above + 1)
+        if i != 0
+    ]
+
+    # Clip rows to polygon boundary and maintain row index
+    with _stage(stats, "clip"):
+        if clip_method == "geos":
+            clipped_rows = _clip_rows_geos(area_rot, row_ys, minx - pad, maxx + pad)
+        elif clip_method == "scanline":
+            clipped_rows = _clip_rows_scanline(area_rot, row_ys)
+        elif clip_method == "vectorized":
+            clipped_rows = _clip_rows_vectorized(area_rot, row_ys, minx - pad, maxx + pad)
+        else:
+            raise ValueError(f"Unknown clip_method {clip_method!r}; expected one of {CLIP_METHODS}")
+    if stats is not None:
+        stats.geos_calls += {"geos": len(row_ys), "vectorized": 1}.get(clip_method, 0)
+
+    # Special handling for row 0: use the actual AB line, if it falls within the rows
+    # range (an AB line well outside the area has none)
+    if -rows_below <= 0 <= rows_above:
+        clipped_rows.append((0, base.ab_rot))
+
     # Sort by row index for consistent ordering
     clipped_rows.sort(key=lambda x: x[0])
 
-    # Prepare output feature lists
-    features = []
-    dest_features = []
-
-    # Store A and B reference points in rotated metric space
-    a_rot = Point(ab_rot_coords[0])
-    b_rot = Point(ab_rot_coords[-1])
-
-    # Helper function to prepare turn geometry
-    def prepare_turn_template(turn_geojson):
-        if not turn_geojson:
-            return None, None
-            
-        if turn_geojson.get("type") == "FeatureCollection":
-            geom = shape(turn_geojson["features"][0]["geometry"])
-        elif turn_geojson.get("type") == "Feature":
-            geom = shape(turn_geojson["geometry"])
-        else:
-            geom = shape(turn_geojson)
-
-        # Determine anchor in the template: use the first coordinate (user-provided convention).
-        if geom.geom_type == "Point":
-            anchor = geom
-        elif geom.geom_type == "LineString":
-            anchor = Point(list(geom.coords)[0])
-        elif geom.geom_type == "Polygon":
-            anchor = Point(list(geom.exterior.coords)[0])
-        else:
-            # fallback to centroid if shape has no simple coordinates
-            anchor = geom.centroid
+    # Orient each segment consistently with AB direction (left to right)
+    row_blocks = []
+    for row_index, seg in clipped_rows:
+        seg_coords = np.asarray(seg.coords)[:, :2]
+        seg_start_x = seg_coords[0, 0]
+        seg_end_x = seg_coords[-1, 0]
+
+        # If AB goes left-to-right (bx > ax), ensure segment also goes left-to-right
+        if (base.ab_dx > 0 and seg_start_x > seg_end_x) or (base.ab_dx < 0 and seg_start_x < seg_end_x):
+            seg_coords = seg_coords[::-1]
+        row_blocks.append(seg_coords)
+
+    frame = base.copy()
+    frame.spacing_m = spacing_m
+    frame.clip_method = clip_method
+    n_rows = len(row_blocks)
+
+    # Ordinal of each segment within its row (rows are sorted, so segments are adjacent)
+    frame.row_index = np.array([i for i, _ in clipped_rows], dtype=np.int64)
+    first = np.searchsorted(frame.row_index, frame.row_index, side="left")
+    frame.segment_ordinals = np.arange(n_rows) - first
+
+    # TRANSFORM BACK: unrotate and project all row coordinates to WGS84 in one pass
+    frame.row_offsets = np.zeros(n_rows + 1, dtype=np.int64)
+    np.cumsum([len(block) for block in row_blocks], out=frame.row_offsets[1:])
+    # a field that no row crosses (AB outside the area) has no rows at all
+    rotated = np.concatenate(row_blocks) if row_blocks else np.empty((0, 2))
+    steps = np.hypot(*np.diff(rotated, axis=0).T)
+    steps[frame.row_offsets[1:-1] - 1] = 0.0  # from one row's last point to the next row's first
+    frame.row_length_m = float(steps.sum())
+    with _stage(stats, "backproject"):
+        frame.row_coords_wgs = _rotated_to_wgs84(rotated, frame.angle_deg,
+                                                 frame.rotation_origin, frame.center_lon, frame.center_lat)
+
+    # Row endpoints and their distances to A, for all rows at once
+    frame.first_pts = np.array([block[0] for block in row_blocks]).reshape(n_rows, 2)
+    frame.last_pts = np.array([block[-1] for block in row_blocks]).reshape(n_rows, 2)
+    a_xy = np.array([frame.a_rot.x, frame.a_rot.y])
+    dist1_to_a = np.hypot(*(frame.first_pts - a_xy).T)
+    dist2_to_a = np.hypot(*(frame.last_pts - a_xy).T)
+    frame.start_nearer_a = dist1_to_a < dist2_to_a
+    frame.start_farther_a = dist1_to_a > dist2_to_a
+
+    # Row directions in the rotated frame; turns are placed here and rotated back
+    # to WGS84 afterwards, which is equivalent to attaching them unrotated.
+    direction = frame.last_pts - frame.first_pts
+    length = np.hypot(*direction.T)
+    length[length == 0] = 1.0
+    frame.cos_r = direction[:, 0] / length
+    frame.sin_r = direction[:, 1] / length
+    return frame
+
+
+def prepare_geometry(area_feature: dict, ab_feature: dict, spacing_m: float = 6.0,
+                     clip_method: str = "geos", stats: Optional[GenerationStats] = None) -> FieldGeometry:
+    """
+    Run the geometry stage: project the area and AB line to UTM, rotate AB onto the x
+    axis, clip the rows and back-project them. The result only depends on these
+    arguments and can be reused by `build_rows` for any labeling, destination or turn
+    settings.
+    """
+    with _stage(stats, "project"):
+        base = _project_field(area_feature, ab_feature)
+    return _clip_field(base, spacing_m, clip_method, stats)
+
+
+def geometry_key(area_feature: dict, ab_feature: dict, spacing_m: float = 6.0,
+                 clip_method: str = "geos") -> str:
+    """Canonical SHA-256 hex digest of the inputs of `prepare_geometry`."""
+    payload = {"area_feature": area_feature, "ab_feature": ab_feature,
+               "spacing_m": float(spacing_m), "clip_method": clip_method}
+    return hashlib.sha256(_canonical_json(payload).encode("utf-8")).hexdigest()
+
+
+class _TurnEnd:
+    """
+    A turn template compiled for one row end.
+
+    `local` holds the template's coordinates relative to its anchor with the flips and
+    the end's fixed rotation (base angle + user offset) already applied, so placing the
+    turns for many rows only needs a per-row rotation by the row direction and a
+    broadcast translation onto the row endpoints.
+    """
+    __slots__ = ("template", "local", "at_a")
+
+    def __init__(self, template, anchor, at_a, base_angle, rotation_offset,
+                 flip_horizontal, flip_vertical):
+        # center template around the anchor (so anchor moves to origin)
+        local = shapely.get_coordinates(template) - (anchor.x, anchor.y)
+        # apply flips if requested (scale by -1 on the respective axis)
+        if flip_horizontal:
+            local[:, 0] = -local[:, 0]
+        if flip_vertical:
+            local[:, 1] = -local[:, 1]
+        # rotate around origin by the end's fixed angle
+        theta = math.radians(base_angle + rotation_offset)
+        cos_t, sin_t = math.cos(theta), math.sin(theta)
+        self.local = np.column_stack([
+            local[:, 0] * cos_t - local[:, 1] * sin_t,
+            local[:, 0] * sin_t + local[:, 1] * cos_t,
+        ])
+        self.template = template
+        self.at_a = at_a
+
+    def place(self, points: np.ndarray, cos_r: np.ndarray, sin_r: np.ndarray) -> np.ndarray:
+        """
+        Attach the turn at each of `points` (n, 2), rotated by each row's direction
+        (given as cos/sin arrays), returning an (n, k, 2) coordinate block.
+        """
+        lx = self.local[None, :, 0]
+        ly = self.local[None, :, 1]
+        cos_r = cos_r[:, None]
+        sin_r = sin_r[:, None]
+        placed = np.empty((len(points), len(self.local), 2))
+        placed[:, :, 0] = points[:, None, 0] + lx * cos_r - ly * sin_r
+        placed[:, :, 1] = points[:, None, 1] + lx * sin_r + ly * cos_r
+        return placed
+
+
+def _prepare_turn_template(turn_geojson, center_lon, center_lat):
+    """Return (template, anchor) projected to UTM, or (None, None) without a template."""
+    if not turn_geojson:
+        return None, None
+
+    if turn_geojson.get("type") == "FeatureCollection":
+        geom = shape(turn_geojson["features"][0]["geometry"])
+    elif turn_geojson.get("type") == "Feature":
+        geom = shape(turn_geojson["geometry"])
+    else:
+        geom = shape(turn_geojson)
 
-        # project both template and anchor to UTM (metric CRS)
-        template_m = _to_utm(geom, center_lon, center_lat)
-        anchor_m = _to_utm(anchor, center_lon, center_lat)
-        return template_m, anchor_m
+    # Determine anchor in the template: use the first coordinate (user-provided convention).
+    if geom.geom_type == "Point":
+        anchor = geom
+    elif geom.geom_type == "LineString":
+        anchor = Point(list(geom.coords)[0])
+    elif geom.geom_type == "Polygon":
+        anchor = Point(list(geom.exterior.coords)[0])
+    else:
+        # fallback to centroid if shape has no simple coordinates
+        anchor = geom.centroid
+
+    # project both template and anchor to UTM (metric CRS)
+    template_m = to_utm(geom, center_lon, center_lat)
+    anchor_m = to_utm(anchor, center_lon, center_lat)
+    return template_m, anchor_m
+
+
+def _projected_template(turn_geojson, center_lon, center_lat):
+    """
+    `_prepare_turn_template` through a thread-safe LRU keyed by the template's canonical
+    JSON and UTM zone, bounded by TEMPLATE_CACHE_SIZE.
+    """
+    if not turn_geojson:
+        return None, None
+    key = (_canonical_json(turn_geojson), get_utm_crs(center_lon, center_lat))
+    with _template_lock:
+        prepared = _template_cache.get(key)
+        if prepared is not None:
+            _template_cache.move_to_end(key)
+            return prepared
+    prepared = _prepare_turn_template(turn_geojson, center_lon, center_lat)
+    with _template_lock:
+        _template_cache[key] = prepared
+        while len(_template_cache) > TEMPLATE_CACHE_SIZE:
+            _template_cache.popitem(last=False)
+    return prepared
+
+
+def _resolve_turn_ends(custom_turn, secondary_turn,
+                       turn_side_a="A", turn_side_b="B",
+                       flip_start_horizontal=False, flip_start_vertical=False,
+                       flip_end_horizontal=False, flip_end_vertical=False,
+                       rotation_offset_a=0.0, rotation_offset_b=0.0) -> List[_TurnEnd]:
+    """
+    Decide which template is attached at each row end and compile it. `custom_turn` and
+    `secondary_turn` are (template, anchor) pairs from `_prepare_turn_template`.
+    """
+    custom_m_template, custom_anchor_m = custom_turn
+    secondary_m_template, secondary_anchor_m = secondary_turn
+
+    turn_ends = []
+    # Attach turn at A end if requested
+    if turn_side_a.upper() == "A":
+        a_template = custom_m_template if custom_m_template is not None else secondary_m_template
+        a_anchor = custom_anchor_m if custom_anchor_m is not None else secondary_anchor_m
+        if a_template is not None and a_anchor is not None:
+            turn_ends.append(_TurnEnd(a_template, a_anchor, True, 0.0, rotation_offset_a,
+                                      flip_start_horizontal, flip_start_vertical))
+
+    # Attach turn at B end if requested (180° base rotation)
+    if turn_side_b.upper() == "B":
+        b_template = secondary_m_template if secondary_m_template is not None else custom_m_template
+        b_anchor = secondary_anchor_m if secondary_anchor_m is not None else custom_anchor_m
+        if b_template is not None and b_anchor is not None:
+            turn_ends.append(_TurnEnd(b_template, b_anchor, False, 180.0, rotation_offset_b,
+                                      flip_end_horizontal, flip_end_vertical))
+    return turn_ends
+
+
+def utc_timestamp() -> str:
+    """Current UTC time in the millisecond ISO format used for createDate/updateDate."""
+    return datetime.datetime.now(datetime.timezone.utc).isoformat(timespec='milliseconds').replace('+00:00', 'Z')
+
+
+def _build_rowset(frame: FieldGeometry, start: int, stop: int, start_num: int, start_letter: str,
+                  zero_pad: bool, dual_zone: bool, keep_start_letter: bool, dest_side: str,
+                  turn_ends: List[_TurnEnd], timestamp: str, id_key: Optional[bytes] = None,
+                  stats: Optional[GenerationStats] = None) -> "RowSet":
+    """
+    Downstream stages for the clipped rows `start:stop` of `frame`: label the rows, pick the
+    destination ends, attach and back-project turns, and wrap it all in a RowSet.
+    Numbering starts at `start_num`. Feature IDs are uuid4 unless an `id_key` (see
+    `content_key`) is given, in which case they are content-derived.
+    """
+    n_rows = stop - start
+
+    # Generate labels using sequential numbering
+    with _stage(stats, "labels"):
+        current_num = start_num
+        labels = []
+        for _ in range(n_rows):
+            if dual_zone:
+                label1 = _label_sequence(start_letter, current_num, 0, zero_pad, keep_start_letter)
+                current_num += 1
+                label2 = _label_sequence(start_letter, current_num, 0, zero_pad, keep_start_letter)
+                current_num += 1
+                labels.append(f"{label1}/{label2}")
+            else:
+                labels.append(_label_sequence(start_letter, current_num, 0, zero_pad, keep_start_letter))
+                current_num += 1
+
+    row_index = frame.row_index[start:stop]
+    ordinals = frame.segment_ordinals[start:stop]
+    start_nearer_a = frame.start_nearer_a[start:stop]
+    start_farther_a = frame.start_farther_a[start:stop]
+
+    def make_ids(role):
+        if id_key is None:
+            return _new_ids(n_rows)
+        return _content_ids(id_key, row_index, ordinals, role)
+
+    # Rows were back-projected by the geometry stage
+    row_offsets = frame.row_offsets[start:stop + 1] - frame.row_offsets[start]
+    row_coords = frame.row_coords_wgs[frame.row_offsets[start]:frame.row_offsets[stop]]
+
+    # Determine destination endpoint based on proximity to A or B
+    use_start = start_nearer_a if dest_side.upper() == "A" else start_farther_a
+
+    # CRITICAL: Use exact coordinate from the line segment for topological connection
+    dest_coords = row_coords[np.where(use_start, row_offsets[:-1], row_offsets[1:] - 1)]
+
+    # Place every turn of each end with one broadcast (A end / B end endpoint), then
+    # unrotate and project all turn coordinates to WGS84 in one pass
+    turns = []
+    if turn_ends:
+        with _stage(stats, "turns"):
+            turn_blocks = []
+            for turn_end in turn_ends:
+                at_start = start_nearer_a if turn_end.at_a else start_farther_a
+                points = np.where(at_start[:, None], frame.first_pts[start:stop], frame.last_pts[start:stop])
+                turn_blocks.append(turn_end.place(points, frame.cos_r[start:stop], frame.sin_r[start:stop]))
+            wgs_coords = _rotated_to_wgs84(np.concatenate([b.reshape(-1, 2) for b in turn_blocks]),
+                                           frame.angle_deg, frame.rotation_origin,
+                                           frame.center_lon, frame.center_lat)
+            pos = 0
+            for turn_end, block in zip(turn_ends, turn_blocks):
+                turn_coords = wgs_coords[pos:pos + block.size // 2].reshape(block.shape)
+                pos += block.size // 2
+                role = ROLE_TURN_A if turn_end.at_a else ROLE_TURN_B
+                turns.append(TurnBlock(turn_coords, make_ids(role), turn_end.template, role))
+
+    if stats is not None:
+        # ordinal 0 marks a row's first segment, so chunked calls count each row once
+        stats.rows += int(np.count_nonzero(ordinals == 0))
+        stats.segments += n_rows
+        stats.turns += n_rows * len(turns)
+        stats.bytes += row_coords.nbytes + dest_coords.nbytes + sum(turn.coords.nbytes for turn in turns)
+
+    return RowSet(
+        row_index=row_index,
+        labels=np.array(labels, dtype=object),
+        row_coords=row_coords,
+        row_offsets=row_offsets,
+        dest_coords=dest_coords,
+        path_ids=make_ids(ROLE_ROW),
+        dest_ids=make_ids(ROLE_DESTINATION),
+        turns=tuple(turns),
+        timestamp=timestamp,
+    )
+
+
+def generate_rows(
+    area_feature: dict,
+    ab_feature: dict,
+    spacing_m: float = 6.0,
+    start_letter: str = "F",
+    start_num: int = 1,
+    zero_pad: bool = True,
+    dual_zone: bool = False,
+    dest_side: str = "A",
+    custom_turn_geojson: Optional[dict] = None,
+    keep_start_letter: bool = True,
+    attach_turns_both_ends: bool = False,
+    flip_start_horizontal: bool = False,
+    flip_start_vertical: bool = False,
+    flip_end_horizontal: bool = False,
+    flip_end_vertical: bool = False,
+    secondary_turn_geojson: Optional[dict] = None,
+    turn_side_a: str = "A",
+    turn_side_b: str = "B",
+    rotation_offset_a: float = 0.0,
+    rotation_offset_b: float = 0.0,
+    clip_method: str = "geos",
+    id_mode: str = "uuid4",
+    stats: Optional[GenerationStats] = None,
+) -> "RowSet":
+    """
+    Generate row paths with consistent spatial reference handling.
     
-    # prepare primary turn geometry
-    custom_m_template, custom_anchor_m = prepare_turn_template(custom_turn_geojson)
+    All geometric operations are performed in EPSG:3857 (Web Mercator) for accurate
+    metric-based spacing calculations. Results are transformed back to WGS84 for output.
     
-    # prepare secondary turn geometry (for opposite end)
-    secondary_m_template, secondary_anchor_m = prepare_turn_template(secondary_turn_geojson)
+    Args:
+        area_feature: GeoJSON Feature (Polygon) in WGS84
+        ab_feature: GeoJSON Feature (LineString) in WGS84 defining reference line A->B
+        spacing_m: Row spacing in meters (applied in projected space)
+        ... (other parameters as before)
+        clip_method: Row clipping engine, one of CLIP_METHODS ("geos" clips each row
+            with a GEOS intersection, "scanline" sweeps all rows over the polygon edges,
+            "vectorized" intersects all rows as one shapely geometry array)
+        id_mode: "uuid4" for random feature IDs, or "content" for IDs derived from
+            the inputs and every output-affecting parameter (`content_key`; not
+            clip_method or id_mode) plus each feature's row, segment and role, so
+            regenerating an unchanged field reproduces the same IDs
+        stats: optional GenerationStats that records per-stage wall time and counters
+            (not part of `generation_key`)
+    
+    Returns:
+        RowSet holding the rows, destinations and turns in WGS84; call `.to_geojson()`
+        for a FeatureCollection with NetworkPath and NetworkDestination features
+    """
+    params = dict(locals())
+    del params["stats"]
+    id_key = _id_key(params.pop("area_feature"), params.pop("ab_feature"), params)
 
+    frame = prepare_geometry(area_feature, ab_feature, spacing_m, clip_method, stats)
+    turn_ends = _resolve_turn_ends(
+        # prepare primary turn geometry, and secondary turn geometry (for opposite end)
+        _prepare_turn_template(custom_turn_geojson, frame.center_lon, frame.center_lat),
+        _prepare_turn_template(secondary_turn_geojson, frame.center_lon, frame.center_lat),
+        turn_side_a, turn_side_b,
+        flip_start_horizontal, flip_start_vertical, flip_end_horizontal, flip_end_vertical,
+        rotation_offset_a, rotation_offset_b,
+    )
     # Generate timestamp once for all features
-    import datetime
-    current_time = datetime.datetime.now(datetime.timezone.utc).isoformat(timespec='milliseconds').replace('+00:00', 'Z')
-    
-    # Initialize sequential numbering
-    current_num = start_num
+    return _build_rowset(frame, 0, len(frame.row_index), start_num, start_letter, zero_pad,
+                         dual_zone, keep_start_letter, dest_side, turn_ends, utc_timestamp(), id_key, stats)
 
-    # Process each clipped row
-    for row_index, seg in clipped_rows:
-        # Orient segment consistently with AB direction (left to right)
-        seg_coords = list(seg.coords)
-        seg_start_x = seg_coords[0][0]
-        seg_end_x = seg_coords[-1][0]
 
-        # If AB goes left-to-right (bx > ax), ensure segment also goes left-to-right
-        if (bx > ax and seg_start_x > seg_end_x) or (bx < ax and seg_start_x < seg_end_x):
-            seg = LineString(seg_coords[::-1])
-            seg_coords = list(seg.coords)
-
-        # Generate label using sequential numbering
-        if dual_zone:
-            label1 = _label_sequence(start_letter, current_num, 0, zero_pad, keep_start_letter)
-            current_num += 1
-            label2 = _label_sequence(start_letter, current_num, 0, zero_pad, keep_start_letter)
-            current_num += 1
-            label = f"{label1}/{label2}"
-        else:
-            label = _label_sequence(start_letter, current_num, 0, zero_pad, keep_start_letter)
-            current_num += 1
-
-        # TRANSFORM BACK: Unrotate and project to WGS84
-        seg_unrot = _rotate(seg, angle_deg, origin=rotation_origin)
-        seg_wgs = _from_utm(seg_unrot, center_lon, center_lat)
-        
-        # Create NetworkPath feature with standardized properties
-        path_feature = {
-            "type": "Feature",
-            "id": str(uuid.uuid4()),
-            "properties": {
-                "type": "NetworkPath",
-                "createDate": current_time,
-                "updateDate": current_time,
-                "version": 1,
-                "direction": "two_way",
-                "speedLimit": "1.2",
-                "enabled": True
-            },
-            "geometry": mapping(seg_wgs),
-        }
-        features.append(path_feature)
-
-        # Determine destination endpoint based on proximity to A or B
-        p1_rot = Point(seg_coords[0])
-        p2_rot = Point(seg_coords[-1])
-        dist1_to_a = p1_rot.distance(a_rot)
-        dist2_to_a = p2_rot.distance(a_rot)
-        
-        if dest_side.upper() == "A":
-            dest_pt_rot = p1_rot if dist1_to_a < dist2_to_a else p2_rot
-            use_start = (dist1_to_a < dist2_to_a)
-        else:
-            dest_pt_rot = p1_rot if dist1_to_a > dist2_to_a else p2_rot
-            use_start = (dist1_to_a > dist2_to_a)
-
-        # CRITICAL: Use exact coordinate from the line segment for topological connection
-        # Transform the chosen endpoint back to WGS84
-        dest_unrot = _rotate(dest_pt_rot, angle_deg, origin=rotation_origin)
-        dest_wgs_temp = _from_utm(dest_unrot, center_lon, center_lat)
-        
-        # Snap to exact line coordinate to ensure topology
-        seg_wgs_coords = list(seg_wgs.coords)
-        dest_coord = seg_wgs_coords[0] if use_start else seg_wgs_coords[-1]
-        dest_wgs = Point(dest_coord)
-        
-        # Create NetworkDestination feature with standardized properties
-        dest_feature = {
-            "type": "Feature",
-            "id": str(uuid.uuid4()),
-            "properties": {
-                "type": "NetworkDestination",
-                "groupMpath": "",
-                "createDate": current_time,
-                "updateDate": current_time,
-                "version": 1,
-                "name": label,
-                "groupId": ""
-            },
-            "geometry": mapping(dest_wgs),
+_signature = None
+
+
+def _generate_rows_signature():
+    """`inspect.signature(generate_rows)`, computed (and inspect imported) once."""
+    global _signature
+    if _signature is None:
+        import inspect
+        _signature = inspect.signature(generate_rows)
+    return _signature
+
+
+def _bind_params(area_feature: dict, ab_feature: dict, kwargs: dict) -> dict:
+    """Bind keyword arguments against `generate_rows`' signature with defaults filled in."""
+    bound = _generate_rows_signature().bind(area_feature, ab_feature, **kwargs)
+    bound.apply_defaults()
+    params = dict(bound.arguments)
+    del params["area_feature"], params["ab_feature"], params["stats"]
+    return params
+
+
+def _turn_ends_for(frame: FieldGeometry, params: dict) -> List[_TurnEnd]:
+    """
+    `_resolve_turn_ends` driven by a bound parameter dict. Projected templates come
+    from `_projected_template`, so reruns, variants and fields share them; `frame`
+    itself is not modified.
+    """
+    def prepared(turn_geojson):
+        return _projected_template(turn_geojson, frame.center_lon, frame.center_lat)
+
+    return _resolve_turn_ends(
+        prepared(params["custom_turn_geojson"]), prepared(params["secondary_turn_geojson"]),
+        params["turn_side_a"], params["turn_side_b"],
+        params["flip_start_horizontal"], params["flip_start_vertical"],
+        params["flip_end_horizontal"], params["flip_end_vertical"],
+        params["rotation_offset_a"], params["rotation_offset_b"],
+    )
+
+
+# Parameters hashed by value rather than by JSON spelling (6 == 6.0, "a" == "A")
+_FLOAT_PARAMS = ("spacing_m", "rotation_offset_a", "rotation_offset_b")
+_UPPER_PARAMS = ("start_letter", "dest_side", "turn_side_a", "turn_side_b")
+
+
+def _normalize_params(params: dict) -> dict:
+    """Coerce bound parameters to the canonical type and case the generator treats them as."""
+    params = dict(params)
+    for name in _FLOAT_PARAMS:
+        params[name] = float(params[name])
+    for name in _UPPER_PARAMS:
+        params[name] = str(params[name]).upper()
+    params["start_num"] = int(params["start_num"])
+    return params
+
+
+def validate_params(**kwargs) -> dict:
+    """
+    Check `generate_rows` keyword arguments without generating anything. Raises
+    TypeError for unknown names and ValueError for invalid values; returns the bound,
+    normalized parameters.
+    """
+    params = _normalize_params(_bind_params({}, {}, kwargs))
+    if not (math.isfinite(params["spacing_m"]) and params["spacing_m"] > 0):
+        raise ValueError(f"spacing_m must be a positive number, got {params['spacing_m']!r}")
+    if params["clip_method"] not in CLIP_METHODS:
+        raise ValueError(f"Unknown clip_method {params['clip_method']!r}; expected one of {CLIP_METHODS}")
+    if params["id_mode"] not in ID_MODES:
+        raise ValueError(f"Unknown id_mode {params['id_mode']!r}; expected one of {ID_MODES}")
+    if params["dest_side"] not in ("A", "B"):
+        raise ValueError(f"dest_side must be 'A' or 'B', got {params['dest_side']!r}")
+    return params
+
+
+def generation_key(area_feature: dict, ab_feature: dict, **kwargs) -> str:
+    """
+    Canonical SHA-256 hex digest of a generation request: both input features, the turn
+    templates and every `generate_rows` parameter with defaults filled in and values
+    normalized (so omitted and explicit defaults, 6 and 6.0, or "a" and "A" hash the same).
+    """
+    params = _normalize_params(_bind_params(area_feature, ab_feature, kwargs))
+    return _request_digest(area_feature, ab_feature, params)
+
+
+def content_key(area_feature: dict, ab_feature: dict, **kwargs) -> str:
+    """
+    `generation_key` without the settings that leave the output unchanged (clip_method,
+    id_mode): the key content IDs are derived from, so switching clipping engine does
+    not change any feature ID.
+    """
+    params = _normalize_params(_bind_params(area_feature, ab_feature, kwargs))
+    for name in _OUTPUT_NEUTRAL_PARAMS:
+        del params[name]
+    return _request_digest(area_feature, ab_feature, params)
+
+
+def _request_digest(area_feature: dict, ab_feature: dict, params: dict) -> str:
+    payload = {"area_feature": area_feature, "ab_feature": ab_feature, "params": params}
+    return hashlib.sha256(_canonical_json(payload).encode("utf-8")).hexdigest()
+
+
+def _id_key(area_feature: dict, ab_feature: dict, params: dict) -> Optional[bytes]:
+    """Return the content-ID key for `params`, or None when uuid4 IDs are requested."""
+    id_mode = params.get("id_mode", "uuid4")
+    if id_mode == "uuid4":
+        return None
+    if id_mode != "content":
+        raise ValueError(f"Unknown id_mode {id_mode!r}; expected one of {ID_MODES}")
+    return bytes.fromhex(content_key(area_feature, ab_feature, **params))
+
+
+def build_rows(geometry: FieldGeometry, **kwargs) -> RowSet:
+    """
+    Run only the downstream stages (labels, destinations, turns) on a prepared geometry.
+
+    Accepts the `generate_rows` keyword arguments except the geometry ones (spacing_m,
+    clip_method), which come from `geometry`; the result equals `generate_rows` with the
+    same arguments, without redoing projection, clipping or row back-projection.
+    """
+    stats = kwargs.pop("stats", None)
+    for name in ("spacing_m", "clip_method"):
+        if name in kwargs and kwargs.pop(name) != getattr(geometry, name):
+            raise ValueError(f"{name} differs from the prepared geometry; call prepare_geometry again")
+    params = _bind_params(geometry.area_feature, geometry.ab_feature,
+                          {**kwargs, "spacing_m": geometry.spacing_m, "clip_method": geometry.clip_method})
+    return _build_rowset(
+        geometry, 0, len(geometry.row_index), params["start_num"], params["start_letter"],
+        params["zero_pad"], params["dual_zone"], params["keep_start_letter"], params["dest_side"],
+        _turn_ends_for(geometry, params), utc_timestamp(),
+        _id_key(geometry.area_feature, geometry.ab_feature, params), stats,
+    )
+
+
+def iter_row_features(area_feature: dict, ab_feature: dict, chunk_rows: int = STREAM_CHUNK_ROWS, **kwargs):
+    """
+    Yield output features row by row instead of building the whole collection.
+
+    Accepts the same keyword arguments as `generate_rows`. The geometry stage runs up
+    front as in `generate_rows` (all rows are clipped and back-projected into one
+    coordinate array); the rows are then labelled, given turns and materialized as
+    features `chunk_rows` at a time, and each row's NetworkPath, its turns and its
+    NetworkDestination are yielded together. Memory therefore grows with the row
+    coordinates only, not with the feature dicts or the serialized output. Pair with
+    `geojson_io.write_feature_collection`.
+    """
+    stats = kwargs.pop("stats", None)
+    params = _bind_params(area_feature, ab_feature, kwargs)
+    frame = prepare_geometry(area_feature, ab_feature, params["spacing_m"], params["clip_method"], stats)
+    turn_ends = _turn_ends_for(frame, params)
+    timestamp = utc_timestamp()
+    id_key = _id_key(area_feature, ab_feature, params)
+    numbers_per_row = 2 if params["dual_zone"] else 1
+
+    n_rows = len(frame.row_index)
+    for offset in range(0, n_rows, chunk_rows):
+        rowset = _build_rowset(
+            frame, offset, min(offset + chunk_rows, n_rows), params["start_num"] + offset * numbers_per_row,
+            params["start_letter"], params["zero_pad"], params["dual_zone"],
+            params["keep_start_letter"], params["dest_side"], turn_ends, timestamp, id_key, stats,
+        )
+        yield from rowset.iter_features(by_row=True)
+
+
+def expand_grid(grid: dict) -> List[dict]:
+    """Cartesian product of {parameter: [values, ...]} as a list of keyword dicts."""
+    names = list(grid)
+    return [dict(zip(names, values)) for values in itertools.product(*(grid[name] for name in names))]
+
+
+def sweep_rows(area_feature: dict, ab_feature: dict, variants: List[dict],
+               workers: Optional[int] = None, **base_kwargs) -> List[dict]:
+    """
+    Evaluate many parameter variants of one field against shared projected state.
+
+    The area, AB line and turn templates are projected and rotated once; rows are
+    clipped once per distinct (spacing_m, clip_method), and only labeling,
+    destinations and turn placement run per variant. Each variant dict overrides
+    `base_kwargs` (any `generate_rows` argument). With `workers` > 1 the clipping and
+    variant stages run on a thread pool that shares this state without copying it.
+
+    Returns one dict per variant, in order, with the variant's `params`, its `rowset`
+    and summary metrics: `rows` (distinct row lines), `segments`, `turns`,
+    `path_length_m` (rows plus turns, in metres) and `seconds`.
+    """
+    base = _project_field(area_feature, ab_feature)
+    all_params = [_bind_params(area_feature, ab_feature, {**base_kwargs, **variant}) for variant in variants]
+    timestamp = utc_timestamp()
+
+    def run(fn, items):
+        if workers and workers > 1:
+            from concurrent.futures import ThreadPoolExecutor
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                return list(pool.map(fn, items))
+        return [fn(item) for item in items]
+
+    # Clip once per distinct spacing / engine
+    clip_keys = list(dict.fromkeys((p["spacing_m"], p["clip_method"]) for p in all_params))
+    clipped = dict(zip(clip_keys, run(lambda key: _clip_field(base, *key), clip_keys)))
+
+    def evaluate(params):
+        started = time.perf_counter()
+        frame = clipped[(params["spacing_m"], params["clip_method"])]
+        turn_ends = _turn_ends_for(frame, params)
+        rowset = _build_rowset(
+            frame, 0, len(frame.row_index), params["start_num"], params["start_letter"],
+            params["zero_pad"], params["dual_zone"], params["keep_start_letter"], params["dest_side"],
+            turn_ends, timestamp, _id_key(area_feature, ab_feature, params),
+        )
+        turn_length = sum(float(shapely.length(end.template)) for end in turn_ends) * rowset.row_count
+        return {
+            "params": params,
+            "rowset": rowset,
+            "rows": len(np.unique(rowset.row_index)),
+            "segments": rowset.row_count,
+            "turns": rowset.row_count * len(turn_ends),
+            "path_length_m": frame.row_length_m + turn_length,
+            "seconds": time.perf_counter() - started,
         }
-        dest_features.append(dest_feature)
-
-        # Calculate row angle in unrotated metric space for turn attachment
-        seg_coords_unrot = list(seg_unrot.coords)
-        seg_dx = seg_coords_unrot[-1][0] - seg_coords_unrot[0][0]
-        seg_dy = seg_coords_unrot[-1][1] - seg_coords_unrot[0][1]
-        row_angle_deg = math.degrees(math.atan2(seg_dy, seg_dx))
-        
-        # Attach turn at A end if requested
-        if turn_side_a.upper() == "A":
-            a_template = custom_m_template if custom_m_template is not None else secondary_m_template
-            a_anchor = custom_anchor_m if custom_anchor_m is not None else secondary_anchor_m
-            
-            if a_template is not None and a_anchor is not None:
-                # Get A endpoint in rotated space
-                turn_a_pt_rot = p1_rot if dist1_to_a < dist2_to_a else p2_rot
-                # Transform to unrotated metric space for attachment
-                turn_a_unrot = _rotate(turn_a_pt_rot, angle_deg, origin=rotation_origin)
-                
-                # Apply rotation offset and flips for A end
-                turn_a_angle = row_angle_deg + rotation_offset_a
-                
-                attached_a = _attach_custom_turn(
-                    a_template, a_anchor, turn_a_unrot,
-                    angle_deg=turn_a_angle,
-                    flip_horizontal=flip_start_horizontal,
-                    flip_vertical=flip_start_vertical
-                )
-                
-                attached_a_wgs = _from_utm(attached_a, center_lon, center_lat)
-                turn_a_feature = {
-                    "type": "Feature",
-                    "id": str(uuid.uuid4()),
-                    "properties": {
-                        "type": "NetworkPath",
-                        "createDate": current_time,
-                        "updateDate": current_time,
-                        "version": 1,
-                        "direction": "two_way",
-                        "speedLimit": "1.2",
-                        "enabled": True
-                    },
-                    "geometry": mapping(attached_a_wgs),
-                }
-                features.append(turn_a_feature)
-        
-        # Attach turn at B end if requested
-        if turn_side_b.upper() == "B":
-            b_template = secondary_m_template if secondary_m_template is not None else custom_m_template
-            b_anchor = secondary_anchor_m if secondary_anchor_m is not None else custom_anchor_m
-            
-            if b_template is not None and b_anchor is not None:
-                # Get B endpoint in rotated space
-                turn_b_pt_rot = p1_rot if dist1_to_a > dist2_to_a else p2_rot
-                # Transform to unrotated metric space for attachment
-                turn_b_unrot = _rotate(turn_b_pt_rot, angle_deg, origin=rotation_origin)
-                
-                # Apply rotation offset and flips for B end (180° base rotation)
-                turn_b_angle = row_angle_deg + 180 + rotation_offset_b
-                
-                attached_b = _attach_custom_turn(
-                    b_template, b_anchor, turn_b_unrot,
-                    angle_deg=turn_b_angle,
-                    flip_horizontal=flip_end_horizontal,
-                    flip_vertical=flip_end_vertical
-                )
-                
-                attached_b_wgs = _from_utm(attached_b, center_lon, center_lat)
-                turn_b_feature = {
-                    "type": "Feature",
-                    "id": str(uuid.uuid4()),
-                    "properties": {
-                        "type": "NetworkPath",
-                        "createDate": current_time,
-                        "updateDate": current_time,
-                        "version": 1,
-                        "direction": "two_way",
-                        "speedLimit": "1.2",
-                        "enabled": True
-                    },
-                    "geometry": mapping(attached_b_wgs),
-                }
-                features.append(turn_b_feature)
 
-    out_fc = {
-        "type": "FeatureCollection",
-        "features": features + dest_features,
-    }
-    return out_fc
+    return run(evaluate, all_params)
+
 
+def generate_rows_geojson(area_feature: dict, ab_feature: dict, *args, return_roles: bool = False,
+                          by_row: bool = False, profile_dir: Optional[str] = None, **kwargs):
+    """
+    Generate row paths as a GeoJSON FeatureCollection.
+
+    Thin wrapper around `generate_rows` (same arguments, positional or keyword) that
+    materializes the columnar result into NetworkPath and NetworkDestination features
+    in WGS84, in `RowSet.iter_features(by_row)` order. With `return_roles` returns
+    (FeatureCollection, FeatureRoles) instead. A
+    `stats` GenerationStats also records the feature building time. With `profile_dir`
+    (or the ROWGEN_PROFILE_DIR environment variable) sampled calls are profiled, see
+    `profiling.profiled`.
+    """
+    if args:
+        # positional generate_rows parameters (spacing_m, start_letter, ...) as keywords
+        bound = _generate_rows_signature().bind_partial(area_feature, ab_feature, *args, **kwargs)
+        kwargs = {name: value for name, value in bound.arguments.items()
+                  if name not in ("area_feature", "ab_feature")}
+    key = lambda: generation_key(area_feature, ab_feature, **kwargs)
+    with profiling.profiled(key, "generate", profile_dir):
+        rowset = generate_rows(area_feature, ab_feature, **kwargs)
+        with _stage(kwargs.get("stats"), "features"):
+            fc = {"type": "FeatureCollection", "features": list(rowset.iter_features(by_row))}
+    if return_roles:
+        return fc, rowset.feature_roles(by_row)
+    return fc
 
 if __name__ == "__main__":
-    import sys
-    if len(sys.argv) < 2:
-        print("Usage: python generator.py input.geojson")
-        sys.exit(1)
-    inpath = sys.argv[1]
-    with open(inpath, "r") as f:
-        data = json.load(f)
-    # expect polygon and line in same collection
-    area = None
-    ab = None
-    for feat in data.get("features", []):
-        geom_type = feat.get("geometry", {}).get("type", "")
-        if geom_type == "Polygon" and area is None:
-            area = feat
-        if geom_type == "LineString" and ab is None:
-            ab = feat
+    import argparse
+    from geojson_io import DEFAULT_PRECISION, read_area_and_ab, write_feature_collection
+
+    parser = argparse.ArgumentParser(description="Generate row paths from a GeoJSON area + AB line.")
+    parser.add_argument("input", help="FeatureCollection with one Polygon and one LineString (AB)")
+    parser.add_argument("-o", "--output", default="-", help="output file (default: stdout)")
+    parser.add_argument("--precision", type=int, default=DEFAULT_PRECISION,
+                        help=f"coordinate decimal places (default: {DEFAULT_PRECISION}; -1 keeps full precision)")
+    parser.add_argument("--compact", action="store_true", help="omit optional whitespace")
+    parser.add_argument("--cache-dir", help="reuse results from (and store them in) this on-disk cache")
+    parser.add_argument("--sweep", metavar="GRID",
+                        help="JSON file of parameter variants: {name: [values]} (a grid) or "
+                             "{\"variants\": [{...}, ...]}; writes a summary instead of features")
+    parser.add_argument("--sweep-dir", help="with --sweep, also write each variant's output here")
+    parser.add_argument("--workers", type=int, help="with --sweep, evaluate variants on this many threads")
+    parser.add_argument("--stats", action="store_true", help="print per-stage timings and counters to stderr")
+    parser.add_argument("--match", action="append", default=[], metavar="NAME=VALUE",
+                        help="only use features whose property NAME equals VALUE (repeatable)")
+    args = parser.parse_args()
+
+    match = {}
+    for item in args.match:
+        name, _, value = item.partition("=")
+        try:
+            match[name] = json.loads(value)  # numbers / booleans compare as such
+        except ValueError:
+            match[name] = value
+    # expect polygon and line in same collection; only read as far as needed to find them
+    area, ab = read_area_and_ab(args.input, match)
     if area is None or ab is None:
         print("Input must contain one Polygon and one LineString (AB).")
         sys.exit(1)
-    out = generate_rows_geojson(area, ab, spacing_m=6.0)
-    print(json.dumps(out))
\ No newline at end of file
+    precision = args.precision if args.precision >= 0 else None
+    if args.sweep:
+        with open(args.sweep, "r") as f:
+            grid = json.load(f)
+        variants = grid["variants"] if "variants" in grid else expand_grid(grid)
+        results = sweep_rows(area, ab, variants, workers=args.workers, spacing_m=6.0)
+        summary = []
+        for n, (variant, result) in enumerate(zip(variants, results)):
+            entry = {"variant": variant}
+            entry.update({k: result[k] for k in ("rows", "segments", "turns", "path_length_m", "seconds")})
+            if args.sweep_dir:
+                os.makedirs(args.sweep_dir, exist_ok=True)
+                entry["output"] = os.path.join(args.sweep_dir, f"variant_{n:03d}.geojson")
+                write_feature_collection(result["rowset"], entry["output"],
+                                         precision=precision, compact=args.compact)
+            summary.append(entry)
+        if args.output == "-":
+            print(json.dumps(summary, indent=2))
+        else:
+            with open(args.output, "w") as f:
+                f.write(json.dumps(summary, indent=2) + "\n")
+        sys.exit(0)
+    stats = GenerationStats() if args.stats else None
+    cache_hit = None
+    if args.cache_dir:
+        from result_cache import ResultCache
+        cache = ResultCache(args.cache_dir)
+        # by_row: the same file layout as the streamed output below
+        features = cache.generate(area, ab, by_row=True, spacing_m=6.0, stats=stats)["features"]
+        cache_hit = cache.stats().hits > 0
+    else:
+        # stream features as rows are generated instead of building the whole collection
+        features = iter_row_features(area, ab, spacing_m=6.0, stats=stats)
+    write_feature_collection(features, args.output, precision=precision, compact=args.compact)
+    if stats is not None:
+        report = stats.as_dict()
+        if cache_hit is not None:
+            report["cache"] = "hit" if cache_hit else "miss"  # a hit runs no stages
+        print(json.dumps(report), file=sys.stderr)
@@ -0,0 +1,302 @@
+import codecs
+import io
+import json
+import os
+import re
+import sys
+import uuid
+from typing import Iterable, Optional
+
+try:
+    import orjson
+except ImportError:  # optional faster JSON backend
+    orjson = None
+
+# Decimal places kept for exported coordinates (~0.1 mm, matches the fleet's input files)
+DEFAULT_PRECISION = 9
+
+
+def _round_coords(coords, precision: int):
+    if coords and isinstance(coords[0], (int, float)):
+        return [round(c, precision) for c in coords]
+    return [_round_coords(c, precision) for c in coords]
+
+
+def quantize_geometry(geometry: Optional[dict], precision: int) -> Optional[dict]:
+    """Return a copy of a GeoJSON geometry with coordinates rounded to `precision` decimals."""
+    if not geometry:
+        return geometry
+    if geometry.get("type") == "GeometryCollection":
+        return {**geometry, "geometries": [quantize_geometry(g, precision) for g in geometry["geometries"]]}
+    return {**geometry, "coordinates": _round_coords(geometry["coordinates"], precision)}
+
+
+def quantize(obj: dict, precision: int) -> dict:
+    """Round the coordinates of a FeatureCollection, Feature or geometry (returns a copy)."""
+    obj_type = obj.get("type")
+    if obj_type == "FeatureCollection":
+        return {**obj, "features": [quantize(f, precision) for f in obj.get("features", [])]}
+    if obj_type == "Feature":
+        return {**obj, "geometry": quantize_geometry(obj.get("geometry"), precision)}
+    return quantize_geometry(obj, precision)
+
+
+def _encode(obj) -> str:
+    """Serialize a single value compactly on one line, using orjson when installed."""
+    if orjson is not None:
+        return orjson.dumps(obj).decode()
+    return json.dumps(obj, separators=(",", ":"))
+
+
+def loads(text):
+    """Parse JSON text (str or bytes), using orjson when installed."""
+    if orjson is not None:
+        return orjson.loads(text)
+    return json.loads(text)
+
+
+def dumps(obj: dict, precision: Optional[int] = None, compact: bool = False) -> str:
+    """
+    Serialize GeoJSON to a string.
+
+    Coordinates are rounded to `precision` decimal places when given. The default
+    layout is indented (indent=2); `compact` drops all optional whitespace. orjson is
+    used when installed, otherwise the standard library json module.
+    """
+    if precision is not None:
+        obj = quantize(obj, precision)
+    if compact:
+        return _encode(obj)
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2).decode()
+    return json.dumps(obj, indent=2)
+
+
+def write_feature_collection(features: Iterable[dict], fp, precision: Optional[int] = None,
+                             compact: bool = False) -> int:
+    """
+    Stream `features` to `fp` as a GeoJSON FeatureCollection without holding them all.
+
+    `fp` may be an open text file, a path, or "-" for stdout. Each feature is
+    serialized as it arrives, so this can consume `generator.iter_row_features`
+    directly; `precision` and `compact` behave as in `dumps`, and the output is laid
+    out as `dumps` would lay out the same collection. Returns the number of features
+    written.
+
+    A path is written through a temporary file in the same directory that replaces it
+    only once every feature was written, so a generation error leaves no truncated file.
+    """
+    if fp == "-":
+        return write_feature_collection(features, sys.stdout, precision, compact)
+    if isinstance(fp, (str, os.PathLike)):
+        directory, name = os.path.split(os.path.abspath(fp))
+        # opened by name (not mkstemp) so the output keeps the usual umask permissions
+        tmp_path = os.path.join(directory, f".{name}.{uuid.uuid4().hex}.tmp")
+        try:
+            with open(tmp_path, "x") as f:
+                count = write_feature_collection(features, f, precision, compact)
+            os.replace(tmp_path, fp)
+        except BaseException:
+            try:
+                os.unlink(tmp_path)
+            except FileNotFoundError:
+                pass
+            raise
+        return count
+
+    if compact:
+        head, lead, sep, tail = '{"type":"FeatureCollection","features":[', "", ",", "]}"
+    else:
+        # indent=2 with each feature two levels deep, as in `dumps`
+        head, lead, sep, tail = '{\n  "type": "FeatureCollection",\n  "features": [', "\n    ", ",\n    ", "]\n}"
+    count = 0
+    fp.write(head)
+    for feat in features:
+        fp.write(sep if count else lead)
+        if precision is not None:
+            feat = quantize(feat, precision)
+        fp.write(_encode(feat) if compact else dumps(feat).replace("\n", "\n    "))
+        count += 1
+    if count and not compact:
+        fp.write("\n  ")
+    fp.write(tail + "\n")
+    return count
+
+
+# Characters (or bytes) read per chunk by the streaming reader
+READ_CHUNK_SIZE = 1 << 20
+
+_WHITESPACE = re.compile(r"[ \t\n\r]*")
+# Characters that may follow a complete JSON value
+_DELIMITERS = " \t\n\r,]}"
+
+
+class _StreamDecoder:
+    """
+    Incremental JSON tokenizer over a readable source: values are decoded with
+    `JSONDecoder.raw_decode` from a buffer that is refilled chunk by chunk and trimmed
+    behind the read position, so memory stays bounded by the largest single value.
+    """
+
+    def __init__(self, read, binary: bool, chunk_size: int):
+        self._read = read
+        self._utf8 = codecs.getincrementaldecoder("utf-8")() if binary else None
+        self._chunk_size = chunk_size
+        self._decoder = json.JSONDecoder()
+        self.buf = ""
+        self.pos = 0
+        self.eof = False
+
+    def _fill(self) -> bool:
+        """Append the next chunk; False at end of input."""
+        while not self.eof:
+            raw = self._read(self._chunk_size)
+            self.eof = not raw
+            chunk = raw if self._utf8 is None else self._utf8.decode(raw or b"", final=self.eof)
+            if chunk:
+                break
+        else:
+            return False
+        if self.pos > self._chunk_size:
+            self.buf = self.buf[self.pos:]
+            self.pos = 0
+        self.buf += chunk
+        return True
+
+    def peek(self) -> str:
+        """Next non-whitespace character ("" at end of input)."""
+        while True:
+            self.pos = _WHITESPACE.match(self.buf, self.pos).end()
+            if self.pos < len(self.buf) or not self._fill():
+                return self.buf[self.pos:self.pos + 1]
+
+    def expect(self, char: str):
+        if self.peek() != char:
+            raise ValueError(f"Expected {char!r} in GeoJSON input, got {self.peek()!r}")
+        self.pos += 1
+
+    def value(self):
+        """Decode the next JSON value."""
+        self.peek()
+        while True:
+            try:
+                obj, end = self._decoder.raw_decode(self.buf, self.pos)
+            except json.JSONDecodeError:
+                if self._fill():
+                    continue
+                raise
+            # a scalar is only complete once a delimiter follows it: at a chunk edge
+            # "12." or "1e" decode as 12 and 1, and "12" may continue as "12.75"
+            if (not isinstance(obj, (dict, list, str)) and not self.eof
+                    and (end == len(self.buf) or self.buf[end] not in _DELIMITERS)):
+                self._fill()
+                continue
+            self.pos = end
+            return obj
+
+
+def _open_source(source):
+    """Return (read, binary, close) for a path, "-", file object or buffer."""
+    if source == "-":
+        return sys.stdin.read, False, None
+    if isinstance(source, (str, os.PathLike)):
+        f = open(source, "rb")
+        return f.read, True, f.close
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        source = io.BytesIO(source)
+    if hasattr(source, "read"):
+        # mmap objects and binary files return bytes; text files return str
+        return source.read, not isinstance(source, io.TextIOBase), None
+    raise TypeError(f"Cannot read GeoJSON from {type(source).__name__}")
+
+
+def iter_features(source, chunk_size: int = READ_CHUNK_SIZE):
+    """
+    Yield the features of a GeoJSON document one at a time without loading it whole.
+
+    `source` may be a path, "-" for stdin, an open text or binary file, an `mmap.mmap`
+    or a bytes-like buffer. The top-level "features" array is decoded feature by
+    feature; other top-level members are skipped. A top-level Feature is yielded
+    as is and a bare geometry is wrapped in a Feature. Stopping the iteration early
+    stops reading.
+    """
+    read, binary, close = _open_source(source)
+    try:
+        stream = _StreamDecoder(read, binary, chunk_size)
+        stream.expect("{")
+        members = {}
+        while stream.peek() != "}":
+            key = stream.value()
+            stream.expect(":")
+            if key == "features":
+                stream.expect("[")
+                while stream.peek() != "]":
+                    yield stream.value()
+                    if stream.peek() == ",":
+                        stream.pos += 1
+                stream.pos += 1
+                members["features"] = None
+            else:
+                members[key] = stream.value()
+            if stream.peek() == ",":
+                stream.pos += 1
+        if "features" not in members:
+            if members.get("type") == "Feature":
+                yield members
+            elif members.get("type"):
+                yield {"type": "Feature", "properties": {}, "geometry": members}
+    finally:
+        if close is not None:
+            close()
+
+
+def _matches(feature: dict, match: Optional[dict]) -> bool:
+    if not match:
+        return True
+    properties = feature.get("properties") or {}
+    return all(properties.get(key) == value for key, value in match.items())
+
+
+def read_area_and_ab(source, match: Optional[dict] = None, chunk_size: int = READ_CHUNK_SIZE):
+    """
+    Return the first Polygon (area) and first LineString (AB) features of a GeoJSON
+    source, or None for each that is missing, reading only as far as needed.
+
+    `match` restricts the search to features whose properties equal every given
+    {name: value}, e.g. {"fieldName": "North 12"}. Accepts the same sources as
+    `iter_features`.
+    """
+    area = None
+    ab = None
+    features = iter_features(source, chunk_size)
+    try:
+        for feat in features:
+            geom_type = (feat.get("geometry") or {}).get("type", "")
+            if geom_type not in ("Polygon", "LineString") or not _matches(feat, match):
+                continue
+            if geom_type == "Polygon" and area is None:
+                area = feat
+            elif geom_type == "LineString" and ab is None:
+                ab = feat
+            if area is not None and ab is not None:
+                break
+    finally:
+        features.close()  # stop reading (and close a file opened from a path)
+    return area, ab
+
+
+def read_areas_and_abs(source, match: Optional[dict] = None, chunk_size: int = READ_CHUNK_SIZE):
+    """
+    Return every Polygon (area) and every LineString (AB) feature of a GeoJSON source
+    as two lists in input order, e.g. for a whole farm export. `match` and the accepted
+    sources are as for `read_area_and_ab`.
+    """
+    areas = []
+    abs_ = []
+    for feat in iter_features(source, chunk_size):
+        geom_type = (feat.get("geometry") or {}).get("type", "")
+        if geom_type == "Polygon" and _matches(feat, match):
+            areas.append(feat)
+        elif geom_type == "LineString" and _matches(feat, match):
+            abs_.append(feat)
+    return areas, abs_
@@ -0,0 +1,146 @@
+"""
+Change-set diff between a previously published network and a regenerated one.
+
+    python network_diff.py previous.geojson new.geojson -o changes.geojson
+
+Features are matched by geometry (in metres, via an STRtree) so that only the
+features that actually moved or changed need to be uploaded again.
+"""
+import argparse
+import json
+import sys
+from typing import Optional
+
+import numpy as np
+import shapely
+from shapely import STRtree
+from shapely.geometry import shape
+
+import generator
+
+# Properties managed by the diff itself rather than compared
+_BOOKKEEPING_PROPERTIES = ("createDate", "updateDate", "version")
+
+
+def _comparable_properties(feature: dict) -> dict:
+    props = feature.get("properties") or {}
+    return {k: v for k, v in props.items() if k not in _BOOKKEEPING_PROPERTIES}
+
+
+def _bump(previous: dict, new: dict, timestamp: str) -> dict:
+    """`new` carrying `previous`'s identity with version and updateDate bumped."""
+    props = dict(new.get("properties") or {})
+    prev_props = previous.get("properties") or {}
+    props["createDate"] = prev_props.get("createDate", props.get("createDate"))
+    props["updateDate"] = timestamp
+    props["version"] = int(prev_props.get("version", 0)) + 1
+    feature = dict(new)
+    feature["properties"] = props
+    if "id" in previous:
+        feature["id"] = previous["id"]
+    return feature
+
+
+def diff_networks(previous_fc: dict, new_fc: dict, tolerance_m: float = 0.05,
+                  match_distance_m: float = 2.0, timestamp: Optional[str] = None) -> dict:
+    """
+    Diff two network FeatureCollections.
+
+    Each new feature is matched to at most one previous feature of the same
+    `properties.type` and geometry type whose Hausdorff distance is within
+    `match_distance_m` (closest pairs first; candidates come from an STRtree query).
+    A matched pair is unchanged when the geometries are within `tolerance_m` and the
+    non-bookkeeping properties are equal; otherwise it is modified and emitted with the
+    previous ID and createDate, `version` + 1 and `updateDate` = `timestamp` (now by
+    default). Unmatched new features are added, unmatched previous ones removed.
+
+    Returns {"added", "removed", "modified"} FeatureCollections and a "summary" of counts.
+    """
+    previous = list(previous_fc.get("features", []))
+    new = list(new_fc.get("features", []))
+    timestamp = timestamp or generator.utc_timestamp()
+
+    matches = []
+    if previous and new:
+        # one metric CRS for both sets, chosen from the mean of all coordinates
+        geoms = np.array([shape(f["geometry"]) for f in previous + new], dtype=object)
+        lon, lat = shapely.get_coordinates(geoms).mean(axis=0)
+        prev_m = generator.to_utm(geoms[:len(previous)], lon, lat)
+        new_m = generator.to_utm(geoms[len(previous):], lon, lat)
+
+        tree = STRtree(prev_m)
+        new_idx, prev_idx = tree.query(new_m, predicate="dwithin", distance=match_distance_m)
+        same_kind = np.array([
+            (new[i].get("properties") or {}).get("type") == (previous[j].get("properties") or {}).get("type")
+            and new[i]["geometry"]["type"] == previous[j]["geometry"]["type"]
+            for i, j in zip(new_idx, prev_idx)
+        ], dtype=bool)
+        new_idx, prev_idx = new_idx[same_kind], prev_idx[same_kind]
+        distances = shapely.hausdorff_distance(new_m[new_idx], prev_m[prev_idx])
+        within = distances <= match_distance_m
+        new_idx, prev_idx, distances = new_idx[within], prev_idx[within], distances[within]
+
+        # greedy one-to-one assignment, closest pairs first
+        used_new = set()
+        used_prev = set()
+        for k in np.argsort(distances, kind="stable"):
+            i, j = int(new_idx[k]), int(prev_idx[k])
+            if i in used_new or j in used_prev:
+                continue
+            used_new.add(i)
+            used_prev.add(j)
+            matches.append((i, j, float(distances[k])))
+
+    matched_new = {i for i, _, _ in matches}
+    matched_prev = {j for _, j, _ in matches}
+    modified = []
+    unchanged = 0
+    for i, j, distance in sorted(matches):
+        if distance <= tolerance_m and _comparable_properties(new[i]) == _comparable_properties(previous[j]):
+            unchanged += 1
+        else:
+            modified.append(_bump(previous[j], new[i], timestamp))
+    added = [f for i, f in enumerate(new) if i not in matched_new]
+    removed = [f for j, f in enumerate(previous) if j not in matched_prev]
+
+    return {
+        "added": {"type": "FeatureCollection", "features": added},
+        "removed": {"type": "FeatureCollection", "features": removed},
+        "modified": {"type": "FeatureCollection", "features": modified},
+        "summary": {
+            "added": len(added),
+            "removed": len(removed),
+            "modified": len(modified),
+            "unchanged": unchanged,
+        },
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Diff a regenerated network against a published one.")
+    parser.add_argument("previous", help="previously published FeatureCollection")
+    parser.add_argument("new", help="regenerated FeatureCollection")
+    parser.add_argument("-o", "--output", default="-", help="output file (default: stdout)")
+    parser.add_argument("--tolerance", type=float, default=0.05,
+                        help="max geometry change in metres still treated as unchanged")
+    parser.add_argument("--match-distance", type=float, default=2.0,
+                        help="max distance in metres for a feature to count as the same feature")
+    args = parser.parse_args(argv)
+
+    with open(args.previous) as f:
+        previous_fc = json.load(f)
+    with open(args.new) as f:
+        new_fc = json.load(f)
+    changes = diff_networks(previous_fc, new_fc, args.tolerance, args.match_distance)
+    text = json.dumps(changes, indent=2)
+    if args.output == "-":
+        print(text)
+    else:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    print(json.dumps(changes["summary"]), file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
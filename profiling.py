@@ -0,0 +1,112 @@
+"""
+Opt-in profiling of generation calls.
+
+    ROWGEN_PROFILE_DIR=/tmp/profiles ROWGEN_PROFILE_EVERY=10 streamlit run app.py
+
+When a profile directory is set (environment variable or `profile_dir=` argument),
+every Nth call through `profiled` is run under cProfile and tracemalloc and writes
+`<label>-<field hash>-<time>-<pid>-<call>.prof` (load with `pstats` or snakeviz) and a
+matching `.mem.txt` with the peak (or the change, if tracemalloc was already
+running) and top allocation sites. Profiling only observes the call; outputs are
+unchanged.
+"""
+import contextlib
+import itertools
+import os
+import threading
+import time
+import warnings
+from typing import Callable, Optional
+
+PROFILE_DIR_ENV = "ROWGEN_PROFILE_DIR"
+PROFILE_EVERY_ENV = "ROWGEN_PROFILE_EVERY"
+
+# Allocation sites listed in the tracemalloc summary
+TOP_ALLOCATIONS = 30
+
+_counters = {}
+_lock = threading.Lock()
+# cProfile allows one active profiler per process; nested or concurrent calls are skipped
+_active = threading.Lock()
+
+
+def _next_call(label: str) -> int:
+    with _lock:
+        return next(_counters.setdefault(label, itertools.count()))
+
+
+def _write_memory_report(path: str, snapshot, memory: str):
+    stats = snapshot.statistics("lineno")
+    with open(path, "w") as f:
+        f.write(memory + "\n")
+        f.write(f"top {TOP_ALLOCATIONS} allocation sites:\n")
+        for stat in stats[:TOP_ALLOCATIONS]:
+            f.write(f"{stat}\n")
+
+
+@contextlib.contextmanager
+def profiled(key: Callable[[], str], label: str = "generate", profile_dir: Optional[str] = None,
+             every: Optional[int] = None):
+    """
+    Profile the enclosed block when enabled and sampled.
+
+    `key` returns the field hash used in the file names and is only called for
+    profiled calls. `profile_dir` and `every` default to ROWGEN_PROFILE_DIR and
+    ROWGEN_PROFILE_EVERY (1). Yields the base path of the written files, or None
+    when the call is not profiled. Profiling never changes the outcome of the call:
+    if the directory or reports cannot be written, a RuntimeWarning is issued and
+    the call runs (or finishes) unprofiled.
+    """
+    profile_dir = profile_dir or os.environ.get(PROFILE_DIR_ENV)
+    if not profile_dir:
+        yield None
+        return
+    every = max(1, int(every or os.environ.get(PROFILE_EVERY_ENV) or 1))
+    call = _next_call(label)
+    if call % every or not _active.acquire(blocking=False):
+        yield None
+        return
+
+    try:
+        # imported here so that disabled profiling costs no imports
+        import cProfile
+        import tracemalloc
+
+        try:
+            os.makedirs(profile_dir, exist_ok=True)
+            stamp = time.strftime("%Y%m%dT%H%M%S")
+            base = os.path.join(profile_dir, f"{label}-{key()[:16]}-{stamp}-{os.getpid()}-{call}")
+        except Exception as e:  # unwritable directory, or inputs the key cannot hash
+            warnings.warn(f"Profiling skipped for this call: {type(e).__name__}: {e}", RuntimeWarning)
+            base = None
+        if base is None:
+            yield None
+            return
+
+        # a caller's tracing is left alone: its peak is not reset, and only the change
+        # in traced memory over the call is reported
+        started_tracing = not tracemalloc.is_tracing()
+        if started_tracing:
+            tracemalloc.start()
+        traced_before, _ = tracemalloc.get_traced_memory()
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            yield base
+        finally:
+            profiler.disable()
+            snapshot = tracemalloc.take_snapshot()
+            traced, peak = tracemalloc.get_traced_memory()
+            if started_tracing:
+                tracemalloc.stop()
+                memory = f"peak traced memory: {peak / 1e6:.2f} MB"
+            else:
+                memory = (f"traced memory change: {(traced - traced_before) / 1e6:+.2f} MB "
+                          f"(tracing was already running, so no peak is reported)")
+            try:
+                profiler.dump_stats(base + ".prof")
+                _write_memory_report(base + ".mem.txt", snapshot, memory)
+            except OSError as e:
+                warnings.warn(f"Could not write profile {base}: {e}", RuntimeWarning)
+    finally:
+        _active.release()
@@ -0,0 +1,145 @@
+import os
+import tempfile
+import threading
+from pathlib import Path
+from typing import NamedTuple, Optional
+
+import generator
+import geojson_io
+
+# Default size bound for the cache directory
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+
+_SUFFIX = ".geojson"
+
+
+class CacheStats(NamedTuple):
+    hits: int
+    misses: int
+    writes: int
+    evictions: int
+    entries: int
+    total_bytes: int
+
+
+class ResultCache:
+    """
+    Content-addressed on-disk cache of `generator.generate_rows_geojson` results.
+
+    Entries are keyed by `generator.generation_key` (a canonical hash of both input
+    features, the turn templates and every keyword parameter) and stored one file per
+    key. Writes go to a temporary file that is atomically renamed into place, so any
+    number of processes can share a directory. Reads refresh the entry's mtime, and
+    once the directory exceeds `max_bytes` the least recently used entries are removed.
+    Hit/miss counters are kept per instance.
+    """
+
+    def __init__(self, directory, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._writes = 0
+        self._evictions = 0
+
+    def _path(self, key: str) -> Path:
+        return self.directory / f"{key}{_SUFFIX}"
+
+    def get(self, key: str) -> Optional[dict]:
+        """Return the cached FeatureCollection for `key`, or None on a miss."""
+        path = self._path(key)
+        try:
+            text = path.read_text(encoding="utf-8")
+            os.utime(path)  # mark as recently used
+        except FileNotFoundError:  # missing, or evicted by another process
+            with self._lock:
+                self._misses += 1
+            return None
+        with self._lock:
+            self._hits += 1
+        return geojson_io.loads(text)
+
+    def put(self, key: str, fc: dict):
+        """Atomically store `fc` under `key`, then evict down to `max_bytes`."""
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, prefix=f".{key}.", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                f.write(geojson_io.dumps(fc, compact=True))
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self._path(key))
+        except BaseException:
+            try:
+                os.unlink(tmp_path)
+            except FileNotFoundError:
+                pass
+            raise
+        with self._lock:
+            self._writes += 1
+        self._evict()
+
+    def generate(self, area_feature: dict, ab_feature: dict, by_row: bool = False, **kwargs) -> dict:
+        """
+        `generator.generate_rows_geojson` through the cache (same arguments). Each
+        feature layout (`by_row`) is cached as its own entry.
+        """
+        key = generator.generation_key(area_feature, ab_feature, **kwargs)
+        if by_row:
+            key += "-by-row"
+        fc = self.get(key)
+        if fc is None:
+            fc = generator.generate_rows_geojson(area_feature, ab_feature, by_row=by_row, **kwargs)
+            self.put(key, fc)
+        return fc
+
+    def _entries(self):
+        """(mtime, size, path) for every committed entry; vanished files are skipped."""
+        entries = []
+        for path in self.directory.glob(f"*{_SUFFIX}"):
+            try:
+                st = path.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((st.st_mtime, st.st_size, path))
+        return entries
+
+    def _evict(self):
+        entries = self._entries()
+        total = sum(size for _, size, _ in entries)
+        if total <= self.max_bytes:
+            return
+        entries.sort(key=lambda e: e[0])
+        evicted = 0
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                path.unlink()
+                evicted += 1
+            except FileNotFoundError:  # another process got there first
+                pass
+            total -= size
+        with self._lock:
+            self._evictions += evicted
+
+    def clear(self):
+        """Remove every entry."""
+        for _, _, path in self._entries():
+            try:
+                path.unlink()
+            except FileNotFoundError:
+                pass
+
+    def stats(self) -> CacheStats:
+        entries = self._entries()
+        with self._lock:
+            return CacheStats(
+                hits=self._hits,
+                misses=self._misses,
+                writes=self._writes,
+                evictions=self._evictions,
+                entries=len(entries),
+                total_bytes=sum(size for _, size, _ in entries),
+            )
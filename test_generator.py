@@ -0,0 +1,54 @@
+import pytest
+from shapely.geometry import Polygon, box
+
+import generator
+import reference_generator
+
+# Metres per degree of latitude (close enough for fields a few hundred metres across)
+M_PER_DEG = 111_320.0
+LON, LAT = -75.19, 39.51
+
+
+def _feature(geometry_type: str, coordinates) -> dict:
+    return {"type": "Feature", "properties": {}, "geometry": {"type": geometry_type, "coordinates": coordinates}}
+
+
+def _sliver_field():
+    """A 2 m sliver 31.5 m north of an east-west AB line: at 6 m spacing no row crosses it."""
+    south, north = LAT + 30.5 / M_PER_DEG, LAT + 32.5 / M_PER_DEG
+    east = LON + 0.001
+    area = _feature("Polygon", [[[LON, south], [east, south], [east, north], [LON, north], [LON, south]]])
+    ab = _feature("LineString", [[LON, LAT], [east, LAT]])
+    return area, ab
+
+
+@pytest.mark.parametrize("clip_method", generator.CLIP_METHODS)
+def test_field_without_rows_is_empty(clip_method):
+    area, ab = _sliver_field()
+    assert reference_generator.generate_rows_geojson(area, ab)["features"] == []
+
+    fc, roles = generator.generate_rows_geojson(area, ab, clip_method=clip_method, return_roles=True)
+    assert fc["features"] == [] and len(roles.role) == 0
+    assert list(generator.iter_row_features(area, ab, clip_method=clip_method)) == []
+
+
+NOTCHED = [
+    box(0, 0, 100, 12),
+    Polygon([(0, 0), (100, 0), (100, 12), (60, 12), (60, 6), (40, 6), (40, 12), (0, 12)]),
+    Polygon([(0, 0), (100, 0), (100, 12), (60, 12), (50, 6), (40, 12), (0, 12)]),
+    Polygon([(0, 0), (100, 0), (100, 12), (0, 12)], [[(40, 2), (60, 2), (60, 6), (40, 6)]]),
+]
+
+
+@pytest.mark.parametrize("area_rot", NOTCHED, ids=["box", "notch", "vee", "hole"])
+def test_scanline_keeps_rows_on_horizontal_edges(area_rot):
+    # rows at 0, 2, 6 and 12 m run along horizontal edges or through vertices
+    row_ys = [(i, float(y)) for i, y in enumerate(range(0, 13, 2))]
+
+    def pieces(rows):
+        return [(i, list(line.coords)) for i, line in rows]
+
+    expected = pieces(generator._clip_rows_geos(area_rot, row_ys, -10.0, 110.0))
+    assert expected[-1][0] == len(row_ys) - 1  # the row along the top edge
+    assert pieces(generator._clip_rows_vectorized(area_rot, row_ys, -10.0, 110.0)) == expected
+    assert pieces(generator._clip_rows_scanline(area_rot, row_ys)) == expected
@@ -0,0 +1,67 @@
+import io
+import json
+import mmap
+
+import pytest
+
+import geojson_io
+
+FEATURES = [
+    {"type": "Feature", "properties": {"name": "Nörth 12", "area_ha": 12.75, "ok": True, "note": None},
+     "geometry": {"type": "Polygon", "coordinates": [[[-93.5, 42.0], [-93.4, 42.0], [-93.4, 42.1], [-93.5, 42.0]]]}},
+    {"type": "Feature", "properties": {"name": "AB ✓", "offset": -1.5e-3},
+     "geometry": {"type": "LineString", "coordinates": [[-93.45, 42.01], [-93.41, 42.05]]}},
+]
+DOCUMENT = {"type": "FeatureCollection", "features": FEATURES, "area_ha": 12.75, "count": 2, "scale": 1e-7}
+TEXT = json.dumps(DOCUMENT, ensure_ascii=False, indent=1)
+CHUNK_SIZES = [1, 2, 3, 5, 7, 64]
+
+
+def _sources(tmp_path):
+    path = tmp_path / "doc.geojson"
+    path.write_text(TEXT, encoding="utf-8")
+    yield io.StringIO(TEXT)
+    yield TEXT.encode("utf-8")
+    yield str(path)
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        yield mm
+
+
+@pytest.mark.parametrize("chunk_size", CHUNK_SIZES)
+def test_iter_features_across_chunk_boundaries(tmp_path, chunk_size):
+    for source in _sources(tmp_path):
+        assert list(geojson_io.iter_features(source, chunk_size)) == FEATURES
+
+
+@pytest.mark.parametrize("chunk_size", CHUNK_SIZES)
+def test_trailing_number_split_after_decimal_point(chunk_size):
+    # every split of "12.75", including right after "12." and "1e"
+    text = '{"features": [], "area_ha": 12.75, "scale": 1e-7}'
+    assert list(geojson_io.iter_features(text.encode(), chunk_size)) == []
+    assert list(geojson_io.iter_features(io.StringIO(text), chunk_size)) == []
+
+
+@pytest.mark.parametrize("chunk_size", CHUNK_SIZES)
+def test_bare_geometry_is_wrapped(chunk_size):
+    text = '{"type": "Point", "coordinates": [-93.5, 42.25]}'
+    assert list(geojson_io.iter_features(text.encode(), chunk_size)) == [
+        {"type": "Feature", "properties": {}, "geometry": {"type": "Point", "coordinates": [-93.5, 42.25]}}
+    ]
+
+
+@pytest.mark.parametrize("chunk_size", CHUNK_SIZES)
+def test_read_area_and_ab_with_match(tmp_path, chunk_size):
+    for source in _sources(tmp_path):
+        area, ab = geojson_io.read_area_and_ab(source, chunk_size=chunk_size)
+        assert area == FEATURES[0] and ab == FEATURES[1]
+    area, ab = geojson_io.read_area_and_ab(TEXT.encode(), {"name": "AB ✓"}, chunk_size)
+    assert area is None and ab == FEATURES[1]
+
+
+@pytest.mark.parametrize("compact", [False, True])
+@pytest.mark.parametrize("features", [FEATURES, []], ids=["features", "empty"])
+def test_streamed_layout_matches_dumps(features, compact):
+    out = io.StringIO()
+    assert geojson_io.write_feature_collection(iter(features), out, 3, compact) == len(features)
+    expected = geojson_io.dumps({"type": "FeatureCollection", "features": features}, 3, compact)
+    assert out.getvalue() == expected + "\n"